@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: legacy PIL preprocessing vs. NumPy preprocessing.
+
+For every page of the given PDFs, measures the preprocessing time of both
+pipelines and, if tesseract is installed, the OCR time on each result.
+
+Usage:
+    python benchmarks/bench_preprocess.py [pdf ...] [--dpi 300] [--lang rus+eng]
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+import fitz
+import pytesseract
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.processors.ocr import PREPROCESSORS, TESSERACT_CONFIG, iter_pixmap_images
+
+
+def tesseract_available() -> bool:
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocessing benchmark")
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: data/input/*.pdf)")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--lang", default="rus+eng")
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(glob.glob("data/input/*.pdf"))
+    run_ocr = tesseract_available()
+    if not run_ocr:
+        print("[WARNING] tesseract not found, measuring preprocessing only")
+
+    timings = {name: {"pre": [], "ocr": []} for name in PREPROCESSORS}
+    for path in pdfs:
+        with fitz.open(path) as doc:
+            for number, img in iter_pixmap_images(doc, range(1, len(doc) + 1), dpi=args.dpi):
+                for name, preprocess in PREPROCESSORS.items():
+                    start = time.perf_counter()
+                    pre = preprocess(img, args.lang)
+                    timings[name]["pre"].append(time.perf_counter() - start)
+                    if run_ocr:
+                        start = time.perf_counter()
+                        pytesseract.image_to_string(pre, lang=args.lang, config=TESSERACT_CONFIG)
+                        timings[name]["ocr"].append(time.perf_counter() - start)
+                print(f"{os.path.basename(path)} page {number}: done")
+
+    print(f"\n{'pipeline':<10} {'pages':>6} {'preprocess, s/page':>20} {'tesseract, s/page':>20}")
+    for name, t in timings.items():
+        pre = statistics.mean(t["pre"]) if t["pre"] else float("nan")
+        ocr = statistics.mean(t["ocr"]) if t["ocr"] else float("nan")
+        print(f"{name:<10} {len(t['pre']):>6} {pre:>20.3f} {ocr:>20.3f}")
+
+
+if __name__ == "__main__":
+    main()
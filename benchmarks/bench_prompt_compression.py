@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: raw OCR prefix vs. compressed prompt text.
+
+For the first pages of the given PDFs (or extracted .txt files), compares the text that would be sent
+to the model as-is (first PROMPT_TEXT_CHARS characters) with the output of
+the prompt compressor: characters and estimated tokens. With --llm, also
+classifies both variants against a running Ollama server and reports the
+prompt tokens it counted, the time and how often the categories agree.
+
+Usage:
+    python benchmarks/bench_prompt_compression.py [pdf ...] [--budget 300] [--llm] [--model mistral]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config_loader import load_json
+from src.processors.llm_client import PROMPT_TEXT_CHARS, classify_with_llm, make_client
+from src.processors.ocr import ocr_options, open_text
+from src.processors.text_compressor import compress_text, estimate_tokens
+
+
+def main():
+    llm_cfg = load_json("config/llm_config.json")
+    parser = argparse.ArgumentParser(description="Prompt compression benchmark")
+    parser.add_argument("pdfs", nargs="*", help="PDF files or already extracted .txt files (default: data/input/*.pdf)")
+    parser.add_argument("--budget", type=int, default=llm_cfg.get("prompt_token_budget") or 300)
+    parser.add_argument("--llm", action="store_true", help="Also classify both variants with Ollama")
+    parser.add_argument("--model", default=llm_cfg.get("model", "mistral"))
+    args = parser.parse_args()
+
+    tesseract_cfg = load_json("config/tesseract_config.json")
+    categories = load_json("config/categories.json")
+    pdfs = args.pdfs or sorted(glob.glob("data/input/*.pdf"))
+
+    variants = {}
+    for path in pdfs:
+        if path.endswith(".txt"):
+            with open(path, encoding="utf-8") as f:
+                head = f.read()
+        else:
+            doc_text = open_text(path, tesseract_cfg["lang"], **ocr_options(tesseract_cfg))
+            head = doc_text.prefix(PROMPT_TEXT_CHARS)
+            doc_text.close()
+        variants[path] = {
+            "raw": head[:PROMPT_TEXT_CHARS],
+            "compressed": compress_text(head, args.budget, PROMPT_TEXT_CHARS) or head[:PROMPT_TEXT_CHARS],
+        }
+
+    print(f"{'document':<24} {'raw chars':>10} {'raw tok':>8} {'comp chars':>11} {'comp tok':>9} {'reduction':>10}")
+    totals = {"raw": 0, "compressed": 0}
+    for path, v in variants.items():
+        raw_tok, comp_tok = estimate_tokens(v["raw"]), estimate_tokens(v["compressed"])
+        totals["raw"] += raw_tok
+        totals["compressed"] += comp_tok
+        reduction = 1 - comp_tok / raw_tok if raw_tok else 0.0
+        print(f"{os.path.basename(path):<24} {len(v['raw']):>10} {raw_tok:>8} "
+              f"{len(v['compressed']):>11} {comp_tok:>9} {reduction:>10.0%}")
+    if totals["raw"]:
+        print(f"\nEstimated prompt text tokens: {totals['raw']} -> {totals['compressed']} "
+              f"({1 - totals['compressed'] / totals['raw']:.0%} less)")
+
+    if not args.llm:
+        return
+    # Responses must come from the model, so the LLM cache is not used here.
+    log_dir = tempfile.mkdtemp(prefix="bench_prompt_compression_")
+    detected = {}
+    for name in ("raw", "compressed"):
+        # Streams stopped early do not report prompt tokens, so read every answer to the end
+        client = make_client({**llm_cfg, "backend": "http", "stream": False})
+        start = time.perf_counter()
+        for path, v in variants.items():
+            detected[name, path] = classify_with_llm(v[name], categories, args.model, log_dir, client=client)[0]
+        wall = time.perf_counter() - start
+        print(f"{name:<11} prompt tokens {client.prompt_tokens:>7}, {wall / max(len(variants), 1):.2f} s/doc")
+        client.close()
+    agree = sum(detected["raw", p] == detected["compressed", p] for p in variants)
+    print(f"Same category for raw and compressed text: {agree} of {len(variants)}")
+    for path in variants:
+        if detected["raw", path] != detected["compressed", path]:
+            print(f"  {os.path.basename(path)}: {detected['raw', path]} -> {detected['compressed', path]}")
+
+
+if __name__ == "__main__":
+    main()
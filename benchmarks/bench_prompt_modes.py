@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: flat vs. hierarchical classification prompt.
+
+Classifies the first pages of the given PDFs with both prompt modes against a
+running Ollama server and reports prompt tokens, generated tokens and wall
+time per document, plus how often both modes agree on the category.
+
+Usage:
+    python benchmarks/bench_prompt_modes.py [pdf ...] [--model mistral] [--host http://localhost:11434]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config_loader import load_json
+from src.processors.llm_client import CLASSIFIERS, PROMPT_TEXT_CHARS, make_client
+from src.processors.ocr import ocr_options, open_text
+
+
+def main():
+    llm_cfg = load_json("config/llm_config.json")
+    parser = argparse.ArgumentParser(description="Prompt mode benchmark")
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: data/input/*.pdf)")
+    parser.add_argument("--model", default=llm_cfg.get("model", "mistral"))
+    parser.add_argument("--host", default=llm_cfg.get("host", "http://localhost:11434"))
+    args = parser.parse_args()
+
+    tesseract_cfg = load_json("config/tesseract_config.json")
+    categories = load_json("config/categories.json")
+    pdfs = args.pdfs or sorted(glob.glob("data/input/*.pdf"))
+    texts = {}
+    for path in pdfs:
+        doc_text = open_text(path, tesseract_cfg["lang"], **ocr_options(tesseract_cfg))
+        texts[path] = doc_text.prefix(PROMPT_TEXT_CHARS)
+        doc_text.close()
+
+    # Responses must come from the model, so the LLM cache is not used here.
+    log_dir = tempfile.mkdtemp(prefix="bench_prompt_modes_")
+    stats = {}
+    detected = {}
+    for mode, classify in CLASSIFIERS.items():
+        # Streams stopped early do not report prompt tokens, so read every answer to the end
+        client = make_client({**llm_cfg, "backend": "http", "stream": False, "host": args.host})
+        start = time.perf_counter()
+        for path, text in texts.items():
+            detected[mode, path] = classify(text, categories, args.model, log_dir, client=client)[0]
+            print(f"{mode:<12} {os.path.basename(path)}: {detected[mode, path]}")
+        stats[mode] = (client.requests, client.prompt_tokens, client.completion_tokens,
+                       time.perf_counter() - start)
+        client.close()
+
+    docs = max(len(texts), 1)
+    print(f"\n{'mode':<12} {'requests':>9} {'prompt tok/doc':>15} {'output tok/doc':>15} {'s/doc':>8}")
+    for mode, (requests, prompt_tokens, completion_tokens, wall) in stats.items():
+        print(f"{mode:<12} {requests:>9} {prompt_tokens / docs:>15.0f} {completion_tokens / docs:>15.0f} {wall / docs:>8.2f}")
+    agree = sum(detected["flat", p] == detected["hierarchical", p] for p in texts)
+    print(f"\nSame category in both modes: {agree} of {len(texts)}")
+    print(f"Raw prompts and answers: {os.path.join(log_dir, 'llm_raw.log')}")
+
+
+if __name__ == "__main__":
+    main()
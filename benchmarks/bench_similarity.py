@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compute_similarity per pair vs. CategorySimilarityIndex.
+
+Scores claimed types against every category from config/categories.json
+(the claimed types are the categories themselves plus variants with the
+number stripped and words dropped) and reports pairs per second for the
+pairwise TfidfVectorizer fit, the index one pair at a time and the index
+scoring all pairs with one sparse product. Also checks that the scores agree,
+and times the is_match sequence fallback (difflib ratio vs. sequence_match)
+and ClaimedTypeResolver lookups.
+
+Usage:
+    python benchmarks/bench_similarity.py [--claims 50] [--repeat 3]
+"""
+
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config_loader import load_json
+from src.processors.classifier import (
+    CategorySimilarityIndex, ClaimedTypeResolver, compute_similarity, normalize_text, sequence_match
+)
+
+
+def claimed_types(categories: list[str], n: int) -> list[str]:
+    rng = random.Random(0)
+    claims = []
+    while len(claims) < n:
+        words = rng.choice(categories).split()
+        words = words[1:] or words
+        claims.append(" ".join(w for w in words if rng.random() > 0.3) or words[0])
+    return claims
+
+
+def rate(pairs: int, seconds: float) -> str:
+    return f"{pairs / seconds:12.0f} pairs/s ({seconds:.3f}s)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Category similarity benchmark")
+    parser.add_argument("--claims", type=int, default=50, help="Number of claimed types")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the index timings (best is reported)")
+    args = parser.parse_args()
+
+    categories = load_json("config/categories.json")
+    claims = claimed_types(categories, args.claims)
+    pairs = [(c, claim) for claim in claims for c in categories]
+    print(f"{len(categories)} categories x {len(claims)} claimed types = {len(pairs)} pairs")
+
+    start = time.perf_counter()
+    reference = [compute_similarity(c, claim) for c, claim in pairs]
+    print(f"compute_similarity:     {rate(len(pairs), time.perf_counter() - start)}")
+
+    start = time.perf_counter()
+    index = CategorySimilarityIndex(categories)
+    print(f"index build:            {time.perf_counter() - start:.3f}s")
+
+    single = batched = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for c, claim in pairs:
+            index.similarity(c, claim)
+        single = min(single, time.perf_counter() - start)
+        start = time.perf_counter()
+        matrix = index.score_matrix(claims)
+        batched = min(batched, time.perf_counter() - start)
+    print(f"index, one pair a call: {rate(len(pairs), single)}")
+    print(f"index, score_matrix:    {rate(len(pairs), batched)}")
+
+    scores = matrix.T.ravel()
+    diff = max(abs(a - b) for a, b in zip(reference, scores))
+    print(f"max score difference:   {diff:.2e}")
+
+    normalized = [(normalize_text(c), normalize_text(claim)) for c, claim in pairs]
+    start = time.perf_counter()
+    reference = [difflib.SequenceMatcher(None, a, b).ratio() >= 0.7 for a, b in normalized]
+    print(f"difflib ratio >= 0.7:   {rate(len(pairs), time.perf_counter() - start)}")
+    start = time.perf_counter()
+    decisions = [sequence_match(a, b, 0.7) for a, b in normalized]
+    print(f"sequence_match:         {rate(len(pairs), time.perf_counter() - start)}")
+    print(f"decisions changed:      {sum(a != b for a, b in zip(reference, decisions))}")
+
+    resolver = ClaimedTypeResolver(categories, similarity=index)
+    start = time.perf_counter()
+    for claim in claims:
+        resolver.top_k(claim)
+    print(f"resolver top_k:         {(time.perf_counter() - start) / len(claims) * 1000:.3f} ms per claim")
+    start = time.perf_counter()
+    resolved = sum(resolver.resolve(claim) is not None for claim in claims)
+    print(f"resolver resolve:       {(time.perf_counter() - start) / len(claims) * 1000:.3f} ms per claim, "
+          f"{resolved}/{len(claims)} resolved")
+
+
+if __name__ == "__main__":
+    main()
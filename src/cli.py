@@ -7,7 +7,8 @@ Usage:
     python -m src.cli analyze <document_path>
     python -m src.cli extract-name <document_path> [--expected-name NAME]
     python -m src.cli check-match <document_path> <claimed_category>
-    python -m src.cli portfolio <manifest_path>
+    python -m src.cli portfolio <manifest_path> [--no-cache]
+    python -m src.cli train-classifier [--log PATH] [--output-path PATH]
 """
 
 import argparse
@@ -20,11 +21,18 @@ import logging
 
 from src.core.config_loader import load_json
 from src.core.models import DocumentResult
-from src.processors.ocr import extract_text
-from src.processors.classifier import compute_similarity, is_match
-from src.processors.llm_client import classify_with_llm
-from src.processors.name_extractor import extract_person_name
+from src.processors.ocr import extract_text, open_text, ocr_options
+from src.processors.classifier import CategorySimilarityIndex, ClaimedTypeResolver, is_match
+from src.processors.llm_client import (
+    make_client, make_cache, make_router, get_classifier_for_mode, PROMPT_TEXT_CHARS
+)
+from src.processors.name_extractor import NameIndex, extract_person_name
 from src.processors.portfolio_analyzer import analyze_portfolio
+from src.processors.portfolio_stages import PortfolioStages, compress_prompt
+from src.processors.lexical_classifier import make_cascade
+from src.processors.distilled_classifier import (
+    DistilledClassifier, DISTILLED_MODEL_PATH, parse_llm_log, train_classifier
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -47,6 +55,87 @@ def load_configs():
         sys.exit(1)
 
 
+_llm_client = None
+_llm_cache = None
+_llm_cache_enabled = True
+_cascade = None
+_router = None
+_similarity_index = None
+
+
+def load_llm_config():
+    """Load config/llm_config.json (empty settings if it is missing)"""
+    try:
+        return load_json("config/llm_config.json")
+    except FileNotFoundError:
+        return {}
+
+
+def get_llm_model():
+    """Return the classification model from llm_config "model" (mistral if not set)"""
+    return load_llm_config().get("model", "mistral")
+
+
+def get_llm_client():
+    """Return the shared Ollama HTTP client from config/llm_config.json (None for the `ollama run` backend)"""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = make_client(load_llm_config())
+    return _llm_client
+
+
+def get_llm_cache():
+    """Return the shared LLM response cache (None when disabled with --no-cache or not configured)"""
+    global _llm_cache
+    if _llm_cache is None and _llm_cache_enabled:
+        _llm_cache = make_cache(load_llm_config())
+    return _llm_cache
+
+
+def get_prompt_classifier():
+    """Return the LLM classification function for llm_config "prompt_mode" (flat or hierarchical)"""
+    return get_classifier_for_mode(load_llm_config().get("prompt_mode", "flat"))
+
+
+def get_router():
+    """Return the shared small-to-large model router (None unless llm_config sets "small_model")"""
+    global _router
+    if _router is None:
+        _router = make_router(load_llm_config(), get_prompt_classifier())
+    return _router
+
+
+def get_llm_classifier():
+    """Return the LLM classifier: the model router if enabled, otherwise the prompt-mode classifier"""
+    return get_router() or get_prompt_classifier()
+
+
+def get_cascade(categories):
+    """Return the shared lexical pre-classifier (None unless llm_config sets "lexical_threshold")"""
+    global _cascade
+    if _cascade is None:
+        _cascade = make_cascade(load_llm_config(), categories, get_llm_classifier())
+    return _cascade
+
+
+def get_similarity_index(categories):
+    """Return the shared category similarity index (category vectors are built once)"""
+    global _similarity_index
+    if _similarity_index is None or _similarity_index.categories != list(categories):
+        _similarity_index = CategorySimilarityIndex(categories)
+    return _similarity_index
+
+
+def get_classifier(categories):
+    """Return the document classifier: the lexical cascade if enabled, otherwise the LLM"""
+    return get_cascade(categories) or get_llm_classifier()
+
+
+def prompt_text(text):
+    """Compress OCR text to llm_config "prompt_token_budget" tokens (unchanged if not set)"""
+    return compress_prompt(text, load_llm_config().get("prompt_token_budget"))
+
+
 def ensure_output_dir():
     """Ensure output directory exists"""
     output_dir = "data/output"
@@ -61,15 +150,18 @@ def classify_command(args):
     tesseract_cfg, categories = load_configs()
     output_dir = ensure_output_dir()
     
-    # Extract text
-    text = extract_text(args.document_path, tesseract_cfg["lang"])
+    # Extract only as many pages as the classification prompt needs
+    doc_text = open_text(args.document_path, tesseract_cfg["lang"], **ocr_options(tesseract_cfg))
+    text = doc_text.prefix(PROMPT_TEXT_CHARS)
+    doc_text.close()
     if not text.strip():
         print("[ERROR] No text extracted from document")
         return
     
     # Classify with LLM
-    detected, description, _ = classify_with_llm(
-        text, categories, tesseract_cfg.get("model", "mistral"), output_dir
+    detected, description, _ = get_classifier(categories)(
+        prompt_text(text), categories, get_llm_model(), output_dir,
+        client=get_llm_client(), cache=get_llm_cache()
     )
     
     # Print results
@@ -77,7 +169,7 @@ def classify_command(args):
     print(f"Document: {os.path.basename(args.document_path)}")
     print(f"Detected Category: {detected}")
     print(f"Description: {description}")
-    print(f"Text Length: {len(text)} characters")
+    print(f"Text Length: {len(text)} characters ({doc_text.pages_read} pages read)")
 
 
 def analyze_command(args):
@@ -88,14 +180,15 @@ def analyze_command(args):
     output_dir = ensure_output_dir()
     
     # Extract text
-    text = extract_text(args.document_path, tesseract_cfg["lang"])
+    text = extract_text(args.document_path, tesseract_cfg["lang"], **ocr_options(tesseract_cfg))
     if not text.strip():
         print("[ERROR] No text extracted from document")
         return
     
     # Classify with LLM
-    detected, description, _ = classify_with_llm(
-        text, categories, tesseract_cfg.get("model", "mistral"), output_dir
+    detected, description, _ = get_classifier(categories)(
+        prompt_text(text), categories, get_llm_model(), output_dir,
+        client=get_llm_client(), cache=get_llm_cache()
     )
     
     # Deep analysis (placeholder - you can extend this with more LLM analysis)
@@ -117,14 +210,14 @@ def extract_name_command(args):
     output_dir = ensure_output_dir()
     
     # Extract text
-    text = extract_text(args.document_path, tesseract_cfg["lang"])
+    text = extract_text(args.document_path, tesseract_cfg["lang"], **ocr_options(tesseract_cfg))
     if not text.strip():
         print("[ERROR] No text extracted from document")
         return
     
     # Extract person name
     person_info = extract_person_name(
-        text, args.expected_name, tesseract_cfg.get("model", "mistral"), output_dir
+        text, args.expected_name, get_llm_model(), output_dir
     )
     
     # Print results
@@ -141,6 +234,43 @@ def extract_name_command(args):
         print(f"Comment: {person_info['comment']}")
 
 
+def load_applicants(paths):
+    """Applicant names from JSON files: lists of names or of objects with "expected_name" (e.g. manifests)"""
+    names = []
+    for path in paths:
+        for entry in load_json(path):
+            name = entry.get("expected_name", "") if isinstance(entry, dict) else entry
+            if name and name.strip():
+                names.append(name.strip())
+    return list(dict.fromkeys(names))
+
+
+def find_applicant_command(args):
+    """Find which applicants' names occur in each document (one scan per document for all applicants)"""
+    try:
+        names = load_applicants(args.applicants)
+    except FileNotFoundError as e:
+        print(f"[ERROR] Applicants file not found: {e.filename}")
+        return
+    if not names:
+        print("[ERROR] No applicant names found")
+        return
+    tesseract_cfg, _ = load_configs()
+    index = NameIndex(names)
+    print(f"[INFO] Indexed {len(index)} applicants")
+    for path in args.document_paths:
+        text = extract_text(path, tesseract_cfg["lang"], **ocr_options(tesseract_cfg))
+        found = index.find(text)
+        print(f"\nDocument: {os.path.basename(path)}")
+        if not text.strip():
+            print("  [WARNING] No text extracted")
+        elif not found:
+            print("  No applicant found")
+        for name, matches in found.items():
+            variants = ", ".join(dict.fromkeys(m.variant for m in matches))
+            print(f"  {name}: {len(matches)} occurrence(s) ({variants})")
+
+
 def check_match_command(args):
     """Extract text, classify with LLM, compare detected vs claimed category"""
     print(f"[INFO] Checking category match for: {args.document_path}")
@@ -148,20 +278,25 @@ def check_match_command(args):
     tesseract_cfg, categories = load_configs()
     output_dir = ensure_output_dir()
     
-    # Extract text
-    text = extract_text(args.document_path, tesseract_cfg["lang"])
+    # Extract only as many pages as the classification prompt needs
+    doc_text = open_text(args.document_path, tesseract_cfg["lang"], **ocr_options(tesseract_cfg))
+    text = doc_text.prefix(PROMPT_TEXT_CHARS)
+    doc_text.close()
     if not text.strip():
         print("[ERROR] No text extracted from document")
         return
     
     # Classify with LLM
-    detected, description, _ = classify_with_llm(
-        text, categories, tesseract_cfg.get("model", "mistral"), output_dir
+    # The router (if enabled) escalates to the large model when the small one disagrees with the claim
+    route = {"claimed": args.claimed_category} if get_router() else {}
+    detected, description, _ = get_classifier(categories)(
+        prompt_text(text), categories, get_llm_model(), output_dir,
+        client=get_llm_client(), cache=get_llm_cache(), **route
     )
     
     # Compare categories
-    similarity = compute_similarity(detected, args.claimed_category)
-    match = is_match(detected, args.claimed_category)
+    similarity = get_similarity_index(categories).similarity(detected, args.claimed_category)
+    match = is_match(detected, args.claimed_category, similarity=similarity)
     
     # Print results
     print(f"\nCategory Match Analysis:")
@@ -190,6 +325,7 @@ def portfolio_command(args):
     output_dir = ensure_output_dir()
     results = []
     input_dir = "data/input"
+    docs = []
     for entry in documents:
         filename = entry["filename"]
         claimed = entry.get("claimed_type", "").strip()
@@ -198,38 +334,40 @@ def portfolio_command(args):
             print(f"[ERROR] File not found: {path}")
             continue
         print(f"\n[INFO] Processing: {filename}")
-        # 1. Извлечение текста
-        text = extract_text(path, tesseract_cfg["lang"])
+        # 1. Извлечение текста. ФИО проверяется первым и по всему документу, поэтому документ
+        #    читается целиком; для классификации из него берутся первые страницы
+        doc_text = open_text(path, tesseract_cfg["lang"], **ocr_options(tesseract_cfg))
+        text = doc_text.full()
         if not text.strip():
             print(f"[WARNING] No text extracted from {filename}")
             continue
-        # 2. Классификация
-        detected, desc, _ = classify_with_llm(
-            text, categories, tesseract_cfg.get("model", "mistral"), output_dir
-        )
-        sim = compute_similarity(detected, claimed)
-        match = is_match(detected, claimed)
-        # 3. Проверка ФИО
-        person = extract_person_name(
-            text, expected_name, tesseract_cfg.get("model", "mistral"), output_dir
-        )
-        fio_match = person.get("match_with_expected", False)
+        docs.append({"filename": filename, "claimed": claimed, "head": doc_text.prefix(PROMPT_TEXT_CHARS), "text": text})
+    # 2-3. Проверка ФИО и классификация (стадии идут от дешёвой к дорогой, см. PortfolioStages.run)
+    similarity_index = get_similarity_index(categories)
+    resolver = ClaimedTypeResolver(categories, similarity=similarity_index)
+    stages = PortfolioStages(categories, get_llm_model(), output_dir, load_llm_config(),
+                             client=get_llm_client(), cache=get_llm_cache(), classify=get_prompt_classifier(),
+                             router=get_router(), cascade=get_cascade(categories), similarity=similarity_index)
+    pipeline = stages.run(docs, expected_name)
+    for doc in docs:
         # 4. Глубокий анализ только если ФИО совпало
         analysis = {}
-        if fio_match:
-            analysis = {"category": detected}
+        if doc["fio_match"]:
+            analysis = {"category": doc["detected"]}
         results.append({
-            "filename": filename,
-            "claimed": claimed,
-            "detected": detected,
-            "description": desc,
-            "similarity": sim,
-            "match": match,
-            "text": text,
-            "person": person,
-            "fio_match": fio_match,
+            "filename": doc["filename"],
+            "claimed": doc["claimed"],
+            "claimed_category": resolver.resolve(doc["claimed"]),
+            "detected": doc["detected"],
+            "description": doc["description"],
+            "similarity": doc["similarity"],
+            "match": doc["match"],
+            "text": doc["text"],
+            "person": doc["person"],
+            "fio_match": doc["fio_match"],
             "analysis": analysis
         })
+    print(f"[INFO] {pipeline.stats()}")
     if not results:
         print("[ERROR] No documents were successfully processed")
         return
@@ -240,6 +378,7 @@ def portfolio_command(args):
     df = pd.DataFrame([{
         "Файл":   r["filename"],
         "Заявлено": r["claimed"],
+        "Заявленная категория": r["claimed_category"] or "",
         "Определено": r["detected"],
         "Описание": r["description"],
         "Сходство": f"{r['similarity']:.2f}",
@@ -296,6 +435,24 @@ def build_manifest_command(args):
         print(f"[ERROR] Failed to save manifest: {e}")
 
 
+def train_classifier_command(args):
+    """Train the distilled category classifier on past LLM answers from llm_raw.log"""
+    _, categories = load_configs()
+    llm_cfg = load_llm_config()
+    logs = args.log or ["data/output/llm_raw.log", "llm_raw.log"]
+    samples = parse_llm_log(logs, categories)
+    print(f"[INFO] Collected {len(samples)} labelled documents from {', '.join(logs)}")
+    try:
+        model, report = train_classifier(samples, test_size=args.test_size)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+    print(report)
+    output_path = args.output_path or llm_cfg.get("distilled_model", DISTILLED_MODEL_PATH)
+    DistilledClassifier(model).save(output_path)
+    print(f"[SUCCESS] Classifier saved to {output_path}")
+
+
 def main():
     """Main CLI entry point"""
     parser = argparse.ArgumentParser(
@@ -306,19 +463,24 @@ Examples:
   python -m src.cli classify data/input/document.pdf
   python -m src.cli analyze data/input/document.pdf
   python -m src.cli extract-name data/input/document.pdf --expected-name "John Doe"
+  python -m src.cli find-applicant data/input/*.pdf --applicants config/user_manifest.json
   python -m src.cli check-match data/input/document.pdf "1.1 диплом с отличием"
   python -m src.cli portfolio config/user_manifest.json
+  python -m src.cli portfolio config/user_manifest.json --no-cache
+  python -m src.cli train-classifier
         """
     )
     
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    llm_options = argparse.ArgumentParser(add_help=False)
+    llm_options.add_argument('--no-cache', action='store_true', help='Do not read or write the LLM response cache')
     
     # Classify command
-    classify_parser = subparsers.add_parser('classify', help='Classify a document')
+    classify_parser = subparsers.add_parser('classify', help='Classify a document', parents=[llm_options])
     classify_parser.add_argument('document_path', help='Path to the document file')
     
     # Analyze command
-    analyze_parser = subparsers.add_parser('analyze', help='Analyze a document')
+    analyze_parser = subparsers.add_parser('analyze', help='Analyze a document', parents=[llm_options])
     analyze_parser.add_argument('document_path', help='Path to the document file')
     
     # Extract name command
@@ -326,25 +488,40 @@ Examples:
     extract_name_parser.add_argument('document_path', help='Path to the document file')
     extract_name_parser.add_argument('--expected-name', help='Expected person name for comparison')
     
+    # Find-applicant command
+    find_applicant_parser = subparsers.add_parser('find-applicant', help='Find which applicants a document belongs to')
+    find_applicant_parser.add_argument('document_paths', nargs='+', help='Paths to the document files')
+    find_applicant_parser.add_argument('--applicants', action='append', required=True,
+                                       help='JSON list of applicant names or manifest (repeatable)')
+    
     # Check match command
-    check_match_parser = subparsers.add_parser('check-match', help='Check if document matches claimed category')
+    check_match_parser = subparsers.add_parser('check-match', help='Check if document matches claimed category', parents=[llm_options])
     check_match_parser.add_argument('document_path', help='Path to the document file')
     check_match_parser.add_argument('claimed_category', help='Claimed document category')
     
     # Portfolio command
-    portfolio_parser = subparsers.add_parser('portfolio', help='Process portfolio from manifest')
+    portfolio_parser = subparsers.add_parser('portfolio', help='Process portfolio from manifest', parents=[llm_options])
     portfolio_parser.add_argument('manifest_path', help='Path to the manifest JSON file')
     
     # Build-manifest command
     build_manifest_parser = subparsers.add_parser('build-manifest', help='Interactively build a user manifest JSON file')
     build_manifest_parser.add_argument('--output-path', help='Path to save the manifest JSON file (default: config/user_manifest.json)')
     
+    # Train-classifier command
+    train_parser = subparsers.add_parser('train-classifier', help='Train the local category classifier on llm_raw.log')
+    train_parser.add_argument('--log', action='append', help='LLM log to learn from (repeatable, default: data/output/llm_raw.log and llm_raw.log)')
+    train_parser.add_argument('--output-path', help='Where to save the model (default: llm_config "distilled_model")')
+    train_parser.add_argument('--test-size', type=float, default=0.2, help='Share of documents held out for evaluation')
+    
     args = parser.parse_args()
     
     if not args.command:
         parser.print_help()
         return
     
+    global _llm_cache_enabled
+    _llm_cache_enabled = not getattr(args, 'no_cache', False)
+    
     # Execute command
     try:
         if args.command == 'classify':
@@ -353,12 +530,22 @@ Examples:
             analyze_command(args)
         elif args.command == 'extract-name':
             extract_name_command(args)
+        elif args.command == 'find-applicant':
+            find_applicant_command(args)
         elif args.command == 'check-match':
             check_match_command(args)
         elif args.command == 'portfolio':
             portfolio_command(args)
         elif args.command == 'build-manifest':
             build_manifest_command(args)
+        elif args.command == 'train-classifier':
+            train_classifier_command(args)
+        if _llm_cache is not None:
+            print(f"[INFO] {_llm_cache.stats()}")
+        if _cascade is not None:
+            print(f"[INFO] {_cascade.stats()}")
+        if _router is not None:
+            print(f"[INFO] {_router.stats()}")
     except KeyboardInterrupt:
         print("\n[INFO] Operation cancelled by user")
     except Exception as e:
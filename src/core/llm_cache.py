@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+class LLMCache:
+    """SQLite cache of raw LLM responses.
+
+    Entries are keyed by the model name, the SHA-256 of the prompt and the
+    generation options, so changing any of them misses. Entries older than
+    ttl_seconds are ignored and purged; when more than max_entries are stored
+    the least recently used ones are removed. Hit and miss counts are kept
+    for the run summary.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, prompt: str, options: Optional[dict] = None) -> str:
+        h = hashlib.sha256()
+        h.update(model.encode("utf-8"))
+        h.update(b"\0" + json.dumps(options or {}, sort_keys=True).encode("utf-8"))
+        h.update(b"\0" + prompt.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, model: str, prompt: str, options: Optional[dict] = None) -> Optional[str]:
+        key = self.key(model, prompt, options)
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT response, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self.hits += 1
+                    return row[0]
+            except sqlite3.Error as e:
+                logging.error(f"Reading LLM cache failed: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, model: str, prompt: str, response: str, options: Optional[dict] = None) -> None:
+        key = self.key(model, prompt, options)
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, model, response, now, now),
+                )
+                self._evict(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Saving LLM cache entry failed: {e}")
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key NOT IN"
+            " (SELECT key FROM responses ORDER BY accessed DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> str:
+        return f"LLM cache: {self.hits} hits, {self.misses} misses"
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
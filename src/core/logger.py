@@ -1,11 +1,22 @@
 import os
+import threading
 from datetime import datetime
+from typing import Optional
 
-def log_llm_call(tag: str, prompt: str, response: str, error: str, output_dir: str):
+# Classification requests may run concurrently; keep each entry in one piece.
+_log_lock = threading.Lock()
+
+def log_llm_call(tag: str, prompt: str, response: str, error: str, output_dir: str,
+                 meta: Optional[dict] = None):
     log_path = os.path.join(output_dir, "llm_raw.log")
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(f"\n=== {tag} | {datetime.now().isoformat()} ===\n")
-        f.write("PROMPT:\n" + prompt + "\n\n")
-        f.write("RESPONSE:\n" + response + "\n")
-        if error:
-            f.write("ERROR:\n" + error + "\n")
+    entry = f"\n=== {tag} | {datetime.now().isoformat()} ===\n"
+    entry += "PROMPT:\n" + prompt + "\n\n"
+    entry += "RESPONSE:\n" + response + "\n"
+    if error:
+        entry += "ERROR:\n" + error + "\n"
+    if meta:
+        entry += "META: " + ", ".join(
+            f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in meta.items()
+        ) + "\n"
+    with _log_lock, open(log_path, "a", encoding="utf-8") as f:
+        f.write(entry)
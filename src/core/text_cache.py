@@ -0,0 +1,72 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+class TextCache:
+    """Content-addressed on-disk cache for extracted document text.
+
+    Entries are keyed by the SHA-256 of the file content plus the extraction
+    settings, so renamed or copied files still hit and edited files miss.
+    When the total size exceeds max_bytes the least recently used entries
+    are removed.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, filepath: str, *settings) -> str:
+        h = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        for s in settings:
+            h.update(b"\0" + str(s).encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.error(f"Reading text cache entry failed: {e}")
+            return None
+        os.utime(path)
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.error(f"Saving text cache entry failed: {e}")
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.cache_dir.glob("*.txt"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except FileNotFoundError:
+                pass
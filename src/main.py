@@ -14,11 +14,12 @@ logging.basicConfig(
 
 from src.core.config_loader import load_json
 from src.core.models import DocumentResult
-from src.processors.ocr import extract_text
-from src.processors.classifier import compute_similarity, is_match
-from src.processors.llm_client import classify_with_llm
-from src.processors.name_extractor import extract_person_name
+from src.processors.ocr import open_text, ocr_options
+from src.processors.classifier import CategorySimilarityIndex, ClaimedTypeResolver
+from src.processors.llm_client import make_client, make_cache, make_router, get_classifier_for_mode, PROMPT_TEXT_CHARS
 from src.processors.portfolio_analyzer import analyze_portfolio
+from src.processors.portfolio_stages import PortfolioStages
+from src.processors.lexical_classifier import make_cascade
 
 # Загрузка конфигов
 TESSERACT_CFG = load_json("config/tesseract_config.json")
@@ -27,6 +28,13 @@ CATEGORIES    = load_json("config/categories.json")
 MANIFEST      = load_json("config/user_manifest.json")
 
 LLM_MODEL = LLM_CFG.get("model", "mistral")
+LLM_CLIENT = make_client(LLM_CFG)
+LLM_CACHE  = make_cache(LLM_CFG)
+LLM_CLASSIFIER  = get_classifier_for_mode(LLM_CFG.get("prompt_mode", "flat"))
+ROUTER  = make_router(LLM_CFG, LLM_CLASSIFIER)
+LEXICAL = make_cascade(LLM_CFG, CATEGORIES, ROUTER or LLM_CLASSIFIER)
+SIMILARITY = CategorySimilarityIndex(CATEGORIES)
+RESOLVER   = ClaimedTypeResolver(CATEGORIES, similarity=SIMILARITY)
 
 INPUT_DIR  = "data/input"
 OUTPUT_DIR = "data/output"
@@ -41,6 +49,7 @@ def main() -> None:
     expected_name = MANIFEST[0]["expected_name"].strip()
     documents = MANIFEST[1:]
     results = []
+    docs = []
     for entry in documents:
         fname = entry["filename"]
         claimed = entry.get("claimed_type", "").strip()
@@ -50,50 +59,40 @@ def main() -> None:
             continue
         logging.info(f"Processing document: {fname}")
         logging.info(f"Claimed category: {claimed if claimed else 'Not provided'}")
-        # 1. Извлечение текста
+        # 1. Извлечение текста. ФИО проверяется первым и по всему документу, поэтому документ
+        #    читается целиком; для классификации из него берутся первые страницы
         logging.info(f"Extracting text from file: {fname}")
-        text = extract_text(path, TESSERACT_CFG["lang"])
+        doc_text = open_text(path, TESSERACT_CFG["lang"], **ocr_options(TESSERACT_CFG))
+        text = doc_text.full()
         if not text.strip():
             logging.warning(f"No text extracted from {fname}")
             continue
-        # 2. Классификация
-        logging.info(f"Running LLM classification for: {fname}")
-        detected, desc, llm_raw = classify_with_llm(text, CATEGORIES, LLM_MODEL, OUTPUT_DIR)
-        logging.debug("[LLM RAW OUTPUT] ------------------------------")
-        logging.debug(llm_raw)
-        logging.debug("[END LLM RAW OUTPUT] --------------------------")
-        logging.info(f"LLM detected category: {detected}")
-        logging.info(f"LLM description: {desc}")
-        sim = compute_similarity(detected, claimed)
-        match = is_match(detected, claimed)
-        logging.info(f"Similarity score: {sim:.3f}")
-        logging.info(f"Category match: {'YES' if match else 'NO'}")
-        # 3. Проверка ФИО
-        logging.info(f"Extracting person name from: {fname}")
-        person = extract_person_name(text, expected_name, LLM_MODEL, OUTPUT_DIR)
-        full_name = person.get('full_name', 'Not found')
-        fio_match = person.get('match_with_expected', False)
-        comment = person.get('comment', '')
-        logging.info(f"Extracted name: {full_name}")
-        logging.info(f"Name matches expected: {'YES' if fio_match else 'NO'}")
-        if comment:
-            logging.info(f"Name extraction comment: {comment}")
+        head = doc_text.prefix(PROMPT_TEXT_CHARS)
+        logging.info(f"Extracted {fname}: {doc_text.pages_read} pages, {len(head)} characters for classification")
+        docs.append({"filename": fname, "claimed": claimed, "head": head, "text": text})
+    # 2-3. Проверка ФИО и классификация (стадии идут от дешёвой к дорогой, см. PortfolioStages.run)
+    stages = PortfolioStages(CATEGORIES, LLM_MODEL, OUTPUT_DIR, LLM_CFG, client=LLM_CLIENT, cache=LLM_CACHE,
+                             classify=LLM_CLASSIFIER, router=ROUTER, cascade=LEXICAL, similarity=SIMILARITY)
+    pipeline = stages.run(docs, expected_name)
+    for doc in docs:
+        fname, claimed, fio_match = doc["filename"], doc["claimed"], doc["fio_match"]
         # 4. Глубокий анализ только если ФИО совпало
         analysis = {}
         if fio_match:
             logging.info(f"Running deep analysis for: {fname}")
-            analysis = {"category": detected}
+            analysis = {"category": doc["detected"]}
         else:
             logging.info(f"Skipping deep analysis for {fname} (FIO mismatch)")
         results.append({
             "filename": fname,
             "claimed": claimed,
-            "detected": detected,
-            "description": desc,
-            "similarity": sim,
-            "match": match,
-            "text": text,
-            "person": person,
+            "claimed_category": RESOLVER.resolve(claimed),
+            "detected": doc["detected"],
+            "description": doc["description"],
+            "similarity": doc["similarity"],
+            "match": doc["match"],
+            "text": doc["text"],
+            "person": doc["person"],
             "fio_match": fio_match,
             "analysis": analysis
         })
@@ -103,6 +102,7 @@ def main() -> None:
     df = pd.DataFrame([{
         "Файл":   r["filename"],
         "Заявлено": r["claimed"],
+        "Заявленная категория": r["claimed_category"] or "",
         "Определено": r["detected"],
         "Описание": r["description"],
         "Сходство": f"{r['similarity']:.2f}",
@@ -118,6 +118,13 @@ def main() -> None:
     with open(summary_path, "w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
     logging.info(f"Reports saved: {details_path}, {summary_path}")
+    if LLM_CACHE is not None:
+        logging.info(LLM_CACHE.stats())
+    if LEXICAL is not None:
+        logging.info(LEXICAL.stats())
+    if ROUTER is not None:
+        logging.info(ROUTER.stats())
+    logging.info(pipeline.stats())
     logging.info("Portfolio analysis complete. See output directory for details.")
 
 if __name__ == "__main__":
@@ -1,7 +1,19 @@
 import difflib
-from sklearn.feature_extraction.text import TfidfVectorizer
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Optional
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
+# IDF of a term present in only one of two documents (smooth_idf: ln(3/2) + 1); shared terms get 1.
+_PAIR_IDF = 1 + math.log(1.5)
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")  # TfidfVectorizer's default token_pattern
+
 def normalize_text(s: str) -> str:
     return " ".join(s.lower().split())
 
@@ -11,9 +23,167 @@ def compute_similarity(a: str, b: str) -> float:
     vec = TfidfVectorizer().fit_transform([a, b])
     return float(cosine_similarity(vec[0], vec[1])[0][0])
 
-def is_match(detected: str, claimed: str, tfidf_threshold: float = 0.65, seq_threshold: float = 0.7) -> bool:
-    sim = compute_similarity(detected, claimed)
+def is_match(detected: str, claimed: str, tfidf_threshold: float = 0.65, seq_threshold: float = 0.7,
+             similarity: Optional[float] = None) -> bool:
+    """similarity: precomputed compute_similarity(detected, claimed), e.g. from CategorySimilarityIndex."""
+    sim = compute_similarity(detected, claimed) if similarity is None else similarity
     if sim >= tfidf_threshold:
         return True
-    seq = difflib.SequenceMatcher(None, normalize_text(detected), normalize_text(claimed)).ratio()
-    return seq >= seq_threshold
+    return sequence_match(normalize_text(detected), normalize_text(claimed), seq_threshold)
+
+def sequence_match(a: str, b: str, threshold: float) -> bool:
+    """SequenceMatcher(None, a, b).ratio() >= threshold, skipping ratio() when its upper bounds already fail."""
+    matcher = difflib.SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return False
+    return matcher.ratio() >= threshold
+
+def _pair_norm(squares, shared):
+    """Squared norm of a string's TF-IDF vector in a two-document fit, from its squared term counts."""
+    return shared + _PAIR_IDF ** 2 * (squares - shared)
+
+def _pair_cosine(dot, a_sq, a_shared, b_sq, b_shared) -> np.ndarray:
+    """Cosine of two-document TF-IDF vectors from raw term counts (see CategorySimilarityIndex)."""
+    norm = np.sqrt(_pair_norm(a_sq, a_shared) * _pair_norm(b_sq, b_shared))
+    return np.divide(dot, norm, out=np.zeros_like(norm, dtype=float), where=norm > 0)
+
+def _term_counts(s: str) -> Counter:
+    return Counter(_TOKEN_RE.findall(s.lower()))
+
+class CategorySimilarityIndex:
+    """
+    compute_similarity for many pairs without refitting a TfidfVectorizer per pair.
+    - Term counts of the categories are vectorized once and kept in memory (save/load to persist).
+    - A pairwise fit gives IDF 1 to terms both strings share and ln(3/2) + 1 to the rest, so the
+      same cosine is recovered from raw counts with a few sparse products.
+    - Unlike compute_similarity, strings without any word tokens score 0.0 instead of raising.
+    """
+    def __init__(self, categories: list[str]):
+        self.categories = list(categories)
+        self._vectorizer = HashingVectorizer(alternate_sign=False, norm=None)
+        self._rows = {c: i for i, c in enumerate(self.categories)}
+        self._set_counts(self._vectorizer.transform(self.categories))
+
+    def _set_counts(self, counts: sp.csr_matrix) -> None:
+        self._category_terms = {c: _term_counts(c) for c in self.categories}
+        self._counts = counts.tocsr()
+        self._squares = self._counts.power(2)
+        self._present = self._counts.sign()
+        self._square_sums = np.asarray(self._squares.sum(axis=1)).ravel()
+        # Transposed (features x categories) copies: products with them avoid converting the query each call
+        self._counts_t = self._counts.T.tocsr()
+        self._squares_t = self._squares.T.tocsr()
+        self._present_t = self._present.T.tocsr()
+
+    def _vectorize(self, texts: list[str]) -> sp.csr_matrix:
+        """Count vectors for texts, reusing the stored rows of known categories."""
+        extra = list(dict.fromkeys(t for t in texts if t not in self._rows))
+        if not extra:
+            return self._counts[[self._rows[t] for t in texts]]
+        rows = {**self._rows, **{t: len(self.categories) + i for i, t in enumerate(extra)}}
+        counts = sp.vstack([self._counts, self._vectorizer.transform(extra)]).tocsr()
+        return counts[[rows[t] for t in texts]]
+
+    def score_matrix(self, claimed: list[str]) -> np.ndarray:
+        """Similarity of every category (rows) to every claimed string (columns)."""
+        b = self._vectorize(claimed)
+        b_squares = b.power(2)
+        dot = (b @ self._counts_t).toarray().T
+        a_shared = (b.sign() @ self._squares_t).toarray().T
+        b_shared = (b_squares @ self._present_t).toarray().T
+        b_sq = np.asarray(b_squares.sum(axis=1)).ravel()
+        return _pair_cosine(dot, self._square_sums[:, None], a_shared, b_sq[None, :], b_shared)
+
+    def score_all(self, claimed: str) -> np.ndarray:
+        """Similarity of claimed to each category, in categories order."""
+        return self.score_matrix([claimed])[:, 0]
+
+    def best(self, claimed: str) -> tuple[str, float]:
+        """Most similar category to claimed and its score."""
+        scores = self.score_all(claimed)
+        i = int(scores.argmax())
+        return self.categories[i], float(scores[i])
+
+    def pairwise(self, a: list[str], b: list[str]) -> np.ndarray:
+        """compute_similarity(a[i], b[i]) for every i."""
+        a, b = self._vectorize(a), self._vectorize(b)
+        a_squares, b_squares = a.power(2), b.power(2)
+        dot = np.asarray(a.multiply(b).sum(axis=1)).ravel()
+        a_shared = np.asarray(a_squares.multiply(b.sign()).sum(axis=1)).ravel()
+        b_shared = np.asarray(b_squares.multiply(a.sign()).sum(axis=1)).ravel()
+        a_sq = np.asarray(a_squares.sum(axis=1)).ravel()
+        b_sq = np.asarray(b_squares.sum(axis=1)).ravel()
+        return _pair_cosine(dot, a_sq, a_shared, b_sq, b_shared)
+
+    def similarity(self, a: str, b: str) -> float:
+        """compute_similarity(a, b) for a single pair (plain Python, cheaper than a sparse product)."""
+        a, b = self._terms(a), self._terms(b)
+        shared = a.keys() & b.keys()
+        dot = sum(a[t] * b[t] for t in shared)
+        norm = math.sqrt(_pair_norm(sum(v * v for v in a.values()), sum(a[t] ** 2 for t in shared)) *
+                         _pair_norm(sum(v * v for v in b.values()), sum(b[t] ** 2 for t in shared)))
+        return dot / norm if norm else 0.0
+
+    def _terms(self, s: str) -> Counter:
+        terms = self._category_terms.get(s)
+        return _term_counts(s) if terms is None else terms
+
+    def save(self, path: str) -> None:
+        joblib.dump({"categories": self.categories, "counts": self._counts}, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CategorySimilarityIndex":
+        data = joblib.load(path)
+        index = cls.__new__(cls)
+        index.categories = data["categories"]
+        index._vectorizer = HashingVectorizer(alternate_sign=False, norm=None)
+        index._rows = {c: i for i, c in enumerate(index.categories)}
+        index._set_counts(data["counts"])
+        return index
+
+def char_ngrams(s: str, n: int = 3) -> set[str]:
+    """Character n-grams of normalize_text(s), padded with spaces so short words still produce grams."""
+    s = f" {normalize_text(s)} "
+    return {s[i:i + n] for i in range(max(1, len(s) - n + 1))}
+
+class ClaimedTypeResolver:
+    """
+    Finds the category an applicant meant by a free-form claimed type.
+    - Character trigrams of the normalized category names go into an inverted index, so a lookup
+      only touches the categories sharing a trigram with the claim (Dice coefficient ranking).
+    - resolve() confirms the nearest candidates with is_match and its usual thresholds.
+    """
+    def __init__(self, categories: list[str], n: int = 3, similarity: Optional[CategorySimilarityIndex] = None):
+        self.categories = list(categories)
+        self.n = n
+        self.similarity = similarity or CategorySimilarityIndex(self.categories)
+        self._sizes = []
+        self._postings = defaultdict(list)
+        for i, category in enumerate(self.categories):
+            grams = char_ngrams(category, n)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(i)
+
+    def top_k(self, claimed: str, k: int = 3) -> list[tuple[str, float]]:
+        """Up to k categories sharing character n-grams with claimed, best first, with their Dice score."""
+        grams = char_ngrams(claimed, self.n)
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in self._postings.get(gram, ()):
+                shared[i] += 1
+        scores = sorted(((2 * c / (len(grams) + self._sizes[i]), i) for i, c in shared.items()), reverse=True)
+        return [(self.categories[i], score) for score, i in scores[:k]]
+
+    def resolve(self, claimed: str, k: int = 3, tfidf_threshold: float = 0.65, seq_threshold: float = 0.7) -> Optional[str]:
+        """Nearest of the top-k categories that is_match accepts for claimed, or None."""
+        if not claimed.strip():
+            return None
+        candidates = [category for category, _ in self.top_k(claimed, k)]
+        if not candidates:
+            return None
+        for category in candidates:
+            sim = self.similarity.similarity(category, claimed)
+            if is_match(category, claimed, tfidf_threshold, seq_threshold, similarity=sim):
+                return category
+        return None
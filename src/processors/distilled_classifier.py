@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import re
+from typing import Iterable, Optional
+
+import joblib
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import FeatureUnion, Pipeline
+
+from src.processors.llm_client import canonical_category
+
+DISTILLED_DESCRIPTION = "Определено обученным классификатором"
+DISTILLED_MODEL_PATH = "data/models/category_classifier.joblib"
+
+_ENTRY_RE = re.compile(r"\n=== (.+?) \| \S+ ===\n")
+_TEXT_RE = re.compile(r"Текст \(.*?\):\n(.*?)(?:\n\nПример:|\n\nRESPONSE:)", re.S)
+_BATCH_TEXT_RE = re.compile(r"\nДокумент (\d+)\. Текст \(.*?\):\n(.*?)(?=\nДокумент \d+\. Текст|\n\nПример:|\n\nRESPONSE:)", re.S)
+_RESPONSE_RE = re.compile(r"\nRESPONSE:\n(.*?)(?:\nERROR:\n.*?)?(?:\nMETA: [^\n]*)?\n*\Z", re.S)
+
+def parse_llm_log(paths: Iterable[str], categories: list[str]) -> list[tuple[str, str]]:
+    """
+    Collect (document text, category) pairs from llm_raw.log files.
+    - Reads classify_with_llm and classify_batch_with_llm entries; cache replays and
+      answers that are not a known category are skipped.
+    - Labels come from the RESPONSE section only (the prompt itself contains "Категория: <...>").
+    - A text seen several times keeps its latest label.
+    """
+    samples = {}
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                content = "\n" + f.read()
+        except FileNotFoundError:
+            logging.warning(f"LLM log not found: {path}")
+            continue
+        parts = _ENTRY_RE.split(content)
+        for tag, body in zip(parts[1::2], parts[2::2]):
+            response = _RESPONSE_RE.search(body)
+            if tag.endswith("(cache)") or not response:
+                continue
+            answer = response.group(1)
+            if tag == "classify_with_llm":
+                text = _TEXT_RE.search(body)
+                label = re.search(r"Категория:\s*(.+)", answer, re.IGNORECASE)
+                if text and label:
+                    category = canonical_category(label.group(1), categories)
+                    if category and text.group(1).strip():
+                        samples[text.group(1).strip()] = category
+            elif tag == "classify_batch_with_llm":
+                start, end = answer.find("["), answer.rfind("]")
+                try:
+                    items = json.loads(answer[start:end + 1]) if start != -1 else []
+                except ValueError:
+                    continue
+                labels = {i.get("id"): i.get("category") for i in items if isinstance(i, dict)}
+                for number, text in _BATCH_TEXT_RE.findall(body):
+                    label = labels.get(int(number))
+                    category = canonical_category(label, categories) if isinstance(label, str) else None
+                    if category and text.strip():
+                        samples[text.strip()] = category
+    return list(samples.items())
+
+def build_model() -> Pipeline:
+    """Word and character n-gram TF-IDF features with a logistic regression on top."""
+    features = FeatureUnion([
+        ("words", TfidfVectorizer(analyzer="word", ngram_range=(1, 2), sublinear_tf=True, min_df=1)),
+        ("chars", TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True, min_df=1)),
+    ])
+    return Pipeline([("features", features), ("clf", LogisticRegression(max_iter=1000, C=10.0))])
+
+def train_classifier(samples: list[tuple[str, str]], test_size: float = 0.2,
+                     random_state: int = 0) -> tuple[Pipeline, str]:
+    """
+    Fit the classifier on LLM-labelled samples. Returns (model, evaluation report).
+    A share of the samples is held out to compare the model with the LLM labels;
+    the returned model is then refitted on all samples.
+    """
+    texts = [t for t, _ in samples]
+    labels = [c for _, c in samples]
+    if len(set(labels)) < 2:
+        raise ValueError("At least two different categories are needed to train the classifier")
+    report = ""
+    if test_size and len(samples) >= 10:
+        counts = {c: labels.count(c) for c in labels}
+        stratify = labels if min(counts.values()) >= 2 else None
+        x_train, x_test, y_train, y_test = train_test_split(
+            texts, labels, test_size=test_size, random_state=random_state, stratify=stratify
+        )
+        if len(set(y_train)) >= 2:
+            model = build_model().fit(x_train, y_train)
+            predicted = model.predict(x_test)
+            report = (
+                f"Held-out agreement with LLM labels: {accuracy_score(y_test, predicted):.3f} "
+                f"({len(y_test)} documents, trained on {len(y_train)})\n"
+                + _coverage_report(model, x_test, y_test)
+                + classification_report(y_test, predicted, zero_division=0)
+            )
+    if not report:
+        report = f"Too few samples for a held-out evaluation ({len(samples)}), trained on all of them\n"
+    return build_model().fit(texts, labels), report
+
+def _coverage_report(model: Pipeline, texts: list[str], labels: list[str]) -> str:
+    """Agreement and coverage at several confidence thresholds, for tuning `distilled_threshold`."""
+    probs = model.predict_proba(texts)
+    classes = model.classes_
+    lines = ["threshold  coverage  agreement"]
+    for threshold in (0.5, 0.6, 0.7, 0.8, 0.9):
+        kept = [(classes[p.argmax()], y) for p, y in zip(probs, labels) if p.max() >= threshold]
+        agree = sum(pred == y for pred, y in kept) / len(kept) if kept else float("nan")
+        lines.append(f"{threshold:>9.1f}  {len(kept) / len(labels):>8.0%}  {agree:>9.3f}")
+    return "\n".join(lines) + "\n\n"
+
+class DistilledClassifier:
+    """Persisted text classifier trained on past LLM decisions (see `train-classifier`)."""
+
+    name = "Distilled"
+    description = DISTILLED_DESCRIPTION
+
+    def __init__(self, model: Pipeline):
+        self.model = model
+
+    @classmethod
+    def load(cls, path: str) -> "DistilledClassifier":
+        return cls(joblib.load(path))
+
+    def save(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self.model, path)
+
+    def predict(self, text: str) -> tuple[str, float, float]:
+        """Best category, its probability and its margin over the runner-up."""
+        probs = self.model.predict_proba([text])[0]
+        order = probs.argsort()[::-1]
+        runner_up = probs[order[1]] if len(order) > 1 else 0.0
+        return self.model.classes_[order[0]], float(probs[order[0]]), float(probs[order[0]] - runner_up)
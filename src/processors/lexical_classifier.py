@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import NamedTuple, Optional
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import linear_kernel
+
+from src.core.config_loader import load_json
+from src.processors.distilled_classifier import DistilledClassifier, DISTILLED_MODEL_PATH
+
+LEXICAL_DESCRIPTION = "Определено по ключевым словам"
+
+class Decision(NamedTuple):
+    """Lexical guess for one document."""
+    category: str
+    score: float
+    margin: float
+    confident: bool
+    audit: bool
+
+    @property
+    def escalate(self) -> bool:
+        """Whether the document still has to be classified by the LLM."""
+        return not self.confident or self.audit
+
+class LexicalClassifier:
+    """
+    TF-IDF classifier over the category names from config/categories.json.
+    Each category is described by its name plus optional keywords; a document is
+    scored against every category by cosine similarity of character n-grams,
+    which tolerates Russian inflection and OCR noise.
+    """
+
+    name = "Lexical"
+    description = LEXICAL_DESCRIPTION
+
+    def __init__(self, categories: list[str], keywords: Optional[dict] = None):
+        keywords = keywords or {}
+        # "Иное" has no vocabulary of its own; it is left to the LLM.
+        self.categories = [c for c in categories if c != "Иное"]
+        docs = [" ".join([c] + keywords.get(c, [])) for c in self.categories]
+        self.vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True)
+        self.matrix = self.vectorizer.fit_transform(docs)
+
+    def scores(self, text: str) -> list[tuple[str, float]]:
+        """All categories with their similarity to the text, best first."""
+        sims = linear_kernel(self.vectorizer.transform([text]), self.matrix)[0]
+        return sorted(zip(self.categories, map(float, sims)), key=lambda p: -p[1])
+
+    def predict(self, text: str) -> tuple[str, float, float]:
+        """Best category, its score and its margin over the runner-up."""
+        ranked = self.scores(text)
+        best, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return best, score, score - runner_up
+
+class LexicalCascade:
+    """
+    Decides obvious documents with a cheap local classifier and escalates the rest to the LLM classifier.
+    `classifier` is a LexicalClassifier or a DistilledClassifier (anything with predict(text)).
+    - A guess is confident when its score and margin reach the thresholds.
+    - A share of confident documents (audit_rate) is still sent to the LLM to measure agreement.
+    - Escalation rate and agreement with the LLM are kept for the run summary.
+    Can be called like classify_with_llm; `fallback` is the LLM classifier to escalate to.
+    """
+
+    def __init__(self, classifier, threshold: float = 0.3, margin: float = 0.05,
+                 audit_rate: float = 0.0, fallback=None):
+        self.classifier = classifier
+        self.threshold = threshold
+        self.margin = margin
+        self.audit_rate = audit_rate
+        self.fallback = fallback
+        self.total = 0
+        self.escalated = 0
+        self.compared = {"confident": [0, 0], "escalated": [0, 0]}  # [agreed, compared]
+        self._lock = threading.Lock()
+
+    def decide(self, text: str) -> Decision:
+        category, score, margin = self.classifier.predict(text)
+        confident = score >= self.threshold and margin >= self.margin
+        # Audit a stable pseudo-random share of confident documents.
+        bucket = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        decision = Decision(category, score, margin, confident, confident and bucket < self.audit_rate)
+        with self._lock:
+            self.total += 1
+            self.escalated += decision.escalate
+        logging.info(
+            f"{self.classifier.name} guess: {category} (score {score:.2f}, margin {margin:.2f}, "
+            f"{'escalated to LLM' if decision.escalate else 'accepted'})"
+        )
+        return decision
+
+    def record(self, decision: Decision, llm_category: str) -> None:
+        """Compare an escalated decision with the category the LLM chose."""
+        kind = "confident" if decision.confident else "escalated"
+        with self._lock:
+            self.compared[kind][0] += decision.category == llm_category
+            self.compared[kind][1] += 1
+
+    def answer(self, decision: Decision) -> tuple[str, str, str]:
+        return decision.category, self.classifier.description, ""
+
+    def __call__(self, text: str, categories: list[str], model: str, output_dir: str,
+                 client=None, cache=None, **kwargs) -> tuple[str, str, str]:
+        decision = self.decide(text)
+        if not decision.escalate:
+            return self.answer(decision)
+        result = self.fallback(text, categories, model, output_dir, client=client, cache=cache, **kwargs)
+        self.record(decision, result[0])
+        return result
+
+    def stats(self) -> str:
+        rate = self.escalated / self.total if self.total else 0.0
+        parts = [f"{self.classifier.name} pre-classifier: {self.total - self.escalated} of {self.total} decided locally, "
+                 f"escalation rate {rate:.0%}"]
+        for kind, (agreed, compared) in self.compared.items():
+            if compared:
+                parts.append(f"agreement with LLM ({kind}): {agreed}/{compared}")
+        return ", ".join(parts)
+
+def make_cascade(llm_cfg: dict, categories: list[str], fallback) -> Optional[LexicalCascade]:
+    """
+    Build the pre-classifier cascade described by llm_config.json.
+    - "pre_classifier": "distilled" uses the model trained by `train-classifier` (falls back to lexical if it is missing).
+    - Otherwise the lexical classifier is used when `lexical_threshold` is set; None disables the cascade.
+    """
+    if llm_cfg.get("pre_classifier", "lexical") == "distilled":
+        model_path = llm_cfg.get("distilled_model", DISTILLED_MODEL_PATH)
+        if os.path.isfile(model_path):
+            return LexicalCascade(
+                DistilledClassifier.load(model_path),
+                threshold=float(llm_cfg.get("distilled_threshold", 0.8)),
+                margin=float(llm_cfg.get("distilled_margin", 0.3)),
+                audit_rate=float(llm_cfg.get("lexical_audit_rate", 0.0)),
+                fallback=fallback,
+            )
+        logging.warning(f"Distilled model not found: {model_path}, using the lexical pre-classifier")
+    if llm_cfg.get("lexical_threshold") is None:
+        return None
+    keywords_path = llm_cfg.get("lexical_keywords", "config/category_keywords.json")
+    keywords = load_json(keywords_path) if keywords_path and os.path.isfile(keywords_path) else {}
+    return LexicalCascade(
+        LexicalClassifier(categories, keywords),
+        threshold=float(llm_cfg["lexical_threshold"]),
+        margin=float(llm_cfg.get("lexical_margin", 0.05)),
+        audit_rate=float(llm_cfg.get("lexical_audit_rate", 0.0)),
+        fallback=fallback,
+    )
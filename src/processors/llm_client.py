@@ -1,24 +1,258 @@
 import os
 import subprocess
 import re
+import json
+import queue
+import threading
+import http.client
+import time
+from typing import Optional
+from urllib.parse import urlsplit
 from src.core.logger import log_llm_call
+from src.core.llm_cache import LLMCache
+from src.processors.portfolio_analyzer import SECTION_PREFIXES
+from src.processors.classifier import ClaimedTypeResolver
 import logging
 
-def classify_with_llm(text: str, categories: list[str], model: str, output_dir: str) -> tuple[str, str, str]:
+# Only this many characters of the document text are put into the classification prompt.
+PROMPT_TEXT_CHARS = 2000
+# Per-document excerpt length in a batched prompt, so a full batch still fits into num_ctx.
+BATCH_TEXT_CHARS = 1000
+# Category number at the start of a name or an answer: "1.1 диплом с отличием" -> "1.1"
+_CODE_RE = re.compile(r"^(\d+\.\d+)\b")
+
+def canonical_category(label: str, categories: list[str]) -> Optional[str]:
+    """Map an LLM answer to a category from categories.json (name in any case or its number, e.g. "1.1"), or None."""
+    label = label.strip()
+    if label in categories:
+        return label
+    for c in categories:
+        if c.casefold() == label.casefold():
+            return c
+    code = _CODE_RE.match(label)
+    if code:
+        for c in categories:
+            if _CODE_RE.match(c) and _CODE_RE.match(c).group(1) == code.group(1):
+                return c
+    return None
+
+class OllamaClient:
     """
-    Classify a document using an LLM. Returns (category, description, raw_output).
-    - Uses a robust prompt with an explicit format and example.
-    - Uses regex for reliable extraction.
-    - Logs prompt and response.
-    - Handles malformed or empty output gracefully.
+    Client for the Ollama generate API (POST /api/generate).
+    - Reuses keep-alive HTTP connections from a small pool, so concurrent callers
+      each get their own connection and nobody pays a new TCP handshake per call.
+    - Sends keep_alive and generation options explicitly, so the model stays loaded
+      between documents and runs with the configured context size and temperature.
+    - Optionally streams the answer and stops reading once the caller has what it needs,
+      instead of waiting for the model to finish rambling.
+    - Counts requests and prompt/completion tokens. Ollama reports prompt_eval_count only in
+      the final chunk of a stream, so requests stopped early add no prompt tokens; measure
+      prompt size with stream off.
     """
-    prompt = (
-        "Ты — помощник приёмной комиссии. Определи категорию документа.\n"
-        "Ответь строго в формате:\nКатегория: <...>\nОписание: <...>\n\n"
-        "Категории:\n" + "\n".join(f"- {c}" for c in categories) +
-        "\n\nТекст (первые 2000 знаков):\n" + text[:2000] +
-        "\n\nПример:\nКатегория: 1.1 диплом с отличием\nОписание: Диплом бакалавра с отличием\n"
+
+    def __init__(self, host: str = "http://localhost:11434", keep_alive: str = "10m",
+                 options: Optional[dict] = None, timeout: float = 300.0, pool_size: int = 4,
+                 stream: bool = False, max_tokens: Optional[int] = None):
+        url = urlsplit(host if "://" in host else f"http://{host}")
+        self.host = url.hostname or "localhost"
+        self.port = url.port or 11434
+        self.keep_alive = keep_alive
+        self.options = options or {}
+        self.timeout = timeout
+        self.stream = stream
+        self.max_tokens = max_tokens
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        # Totals reported by the server, for benchmarks and run summaries.
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._stats_lock = threading.Lock()
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _send(self, path: str, payload: dict) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """POST a JSON payload; returns the connection and the response with its headers read."""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # A pooled connection was closed by the server while idle; retry once on a fresh one.
+                conn.close()
+                if attempt:
+                    raise
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                raise
+
+    def _finish(self, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse) -> None:
+        """Return a fully read connection to the pool."""
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+
+    def _post(self, path: str, payload: dict) -> tuple[int, bytes]:
+        conn, resp = self._send(path, payload)
+        try:
+            data = resp.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+        self._finish(conn, resp)
+        return resp.status, data
+
+    def request_options(self, max_tokens: Optional[int] = None) -> dict:
+        """Generation options actually sent for a request, including num_predict."""
+        options = dict(self.options)
+        if max_tokens or self.max_tokens:
+            options["num_predict"] = max_tokens or self.max_tokens
+        return options
+
+    def cache_options(self, max_tokens: Optional[int] = None) -> dict:
+        """Everything in a request that can change the answer, for the response cache key."""
+        return {**self.request_options(max_tokens), "stream": self.stream}
+
+    def _payload(self, model: str, prompt: str, max_tokens: Optional[int]) -> dict:
+        return {
+            "model": model,
+            "prompt": prompt,
+            "stream": self.stream,
+            "keep_alive": self.keep_alive,
+            "options": self.request_options(max_tokens),
+        }
+
+    def _count(self, reply: dict, meta: Optional[dict]) -> None:
+        with self._stats_lock:
+            self.requests += 1
+            self.prompt_tokens += reply.get("prompt_eval_count", 0)
+            self.completion_tokens += reply.get("eval_count", 0)
+        if meta is not None:
+            meta["prompt_tokens"] = reply.get("prompt_eval_count", 0)
+            meta["tokens"] = reply.get("eval_count", meta.get("tokens", 0))
+
+    def generate(self, model: str, prompt: str, stop=None, max_tokens: Optional[int] = None,
+                 meta: Optional[dict] = None) -> tuple[str, str]:
+        """
+        Run a generation. Returns (response, error).
+        - max_tokens caps the output (num_predict); defaults to the client's max_tokens.
+        - In streaming mode `stop(text)` is checked as tokens arrive and the generation is
+          cancelled as soon as it returns True.
+        - `meta` (if given) receives time to first token, total time and token counts.
+        """
+        start = time.perf_counter()
+        payload = self._payload(model, prompt, max_tokens)
+        if self.stream:
+            out, err = self._generate_stream(payload, stop, start, meta)
+        else:
+            status, data = self._post("/api/generate", payload)
+            try:
+                reply = json.loads(data.decode("utf-8"))
+            except ValueError:
+                reply = {}
+            if status != 200:
+                return "", reply.get("error") or f"HTTP {status}"
+            self._count(reply, meta)
+            out, err = reply.get("response", ""), ""
+        if meta is not None:
+            meta["duration"] = time.perf_counter() - start
+        return out, err
+
+    def _generate_stream(self, payload: dict, stop, start: float, meta: Optional[dict]) -> tuple[str, str]:
+        conn, resp = self._send("/api/generate", payload)
+        if resp.status != 200:
+            try:
+                reply = json.loads(resp.read().decode("utf-8"))
+            except (ValueError, http.client.HTTPException, OSError):
+                reply = {}
+            conn.close()
+            return "", reply.get("error") or f"HTTP {resp.status}"
+        text, tokens, done = "", 0, False
+        try:
+            for line in resp:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line.decode("utf-8"))
+                if chunk.get("error"):
+                    conn.close()
+                    return text, chunk["error"]
+                piece = chunk.get("response", "")
+                if piece:
+                    if meta is not None and "ttft" not in meta:
+                        meta["ttft"] = time.perf_counter() - start
+                    text += piece
+                    tokens += 1
+                if chunk.get("done"):
+                    done = True
+                    if meta is not None:
+                        meta["tokens"] = tokens
+                    self._count(chunk, meta)
+                    break
+                if stop is not None and stop(text):
+                    break
+        except (ValueError, http.client.HTTPException, OSError):
+            conn.close()
+            raise
+        if done:
+            resp.read()  # drain the end of the chunked body so the connection can be reused
+            self._finish(conn, resp)
+        else:
+            # Closing the connection makes Ollama cancel the rest of the generation.
+            conn.close()
+            with self._stats_lock:
+                self.requests += 1
+                self.completion_tokens += tokens
+            if meta is not None:
+                meta["tokens"] = tokens
+                meta["stopped_early"] = True
+        return text, ""
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+def make_client(llm_cfg: dict) -> Optional[OllamaClient]:
+    """Build the HTTP client described by llm_config.json, or None for the `ollama run` backend."""
+    if llm_cfg.get("backend", "cli") != "http":
+        return None
+    return OllamaClient(
+        host=llm_cfg.get("host", "http://localhost:11434"),
+        keep_alive=llm_cfg.get("keep_alive", "10m"),
+        options=llm_cfg.get("options"),
+        timeout=float(llm_cfg.get("timeout", 300)),
+        pool_size=max(4, int(llm_cfg.get("concurrency", 1))),
+        stream=bool(llm_cfg.get("stream", False)),
+        max_tokens=llm_cfg.get("max_tokens"),
     )
+
+def make_cache(llm_cfg: dict) -> Optional[LLMCache]:
+    """Open the response cache described by llm_config.json, or None when `cache_path` is not set."""
+    path = llm_cfg.get("cache_path")
+    if not path:
+        return None
+    return LLMCache(
+        path,
+        ttl_seconds=float(llm_cfg.get("cache_ttl_hours", 168)) * 3600,
+        max_entries=int(llm_cfg.get("cache_max_entries", 5000)),
+    )
+
+def _run_ollama_cli(prompt: str, model: str) -> tuple[str, str]:
     proc = subprocess.run(
         ["ollama", "run", model],
         input=prompt.encode("utf-8"),
@@ -26,15 +260,100 @@ def classify_with_llm(text: str, categories: list[str], model: str, output_dir:
     )
     out = proc.stdout.decode("utf-8", errors="ignore").strip()
     err = proc.stderr.decode("utf-8", errors="ignore").strip()
+    return out, err
+
+def run_llm(prompt: str, model: str, client: Optional[OllamaClient] = None,
+            cache: Optional[LLMCache] = None, stop=None, max_tokens: Optional[int] = None,
+            meta: Optional[dict] = None) -> tuple[str, str, bool]:
+    """
+    Send a prompt to the model and return (output, error, from_cache).
+    Answers from the cache when it has a fresh response for the same model, prompt and options.
+    Uses the HTTP client when given and falls back to `ollama run` if the server is unreachable.
+    `stop`, `max_tokens` and `meta` are passed to OllamaClient.generate.
+    Exits the process if the model does not exist.
+    """
+    options = client.cache_options(max_tokens) if client is not None else None
+    if cache is not None:
+        cached = cache.get(model, prompt, options)
+        if cached is not None:
+            return cached, "", True
+    out, err = None, ""
+    if client is not None:
+        try:
+            out, err = client.generate(model, prompt, stop=stop, max_tokens=max_tokens, meta=meta)
+            out = out.strip()
+        except (http.client.HTTPException, OSError) as e:
+            logging.warning(f"Ollama HTTP API unavailable ({e}), falling back to `ollama run`")
+            out = None
+    if out is None:
+        out, err = _run_ollama_cli(prompt, model)
     if "no such model" in err.lower() or "not found" in err.lower():
         logging.critical(f"Ollama error: {err}")
         import sys
         sys.exit(1)
-    log_llm_call("classify_with_llm", prompt, out, err, output_dir)
+    if cache is not None and out and not err:
+        cache.put(model, prompt, out, options)
+    if meta and "ttft" in meta:
+        logging.info(
+            f"LLM answer: first token after {meta['ttft']:.2f}s, {meta.get('tokens', 0)} tokens in "
+            f"{meta['duration']:.2f}s{' (stopped early)' if meta.get('stopped_early') else ''}"
+        )
+    return out, err, False
+
+def strip_reasoning(text: str) -> str:
+    """Drop <think>...</think> blocks (and an unfinished one) that reasoning models emit before the answer."""
+    text = re.sub(r"<think>.*?</think>", "", text, flags=re.S)
+    return text.split("<think>", 1)[0]
+
+def classification_complete(text: str) -> bool:
+    """Whether both the Категория and Описание lines have been received in full."""
+    answer = strip_reasoning(text)
+    return bool(re.search(r"Категория:[^\n]*\S[^\n]*\n", answer, re.IGNORECASE)
+                and re.search(r"Описание:[^\n]*\S[^\n]*\n", answer, re.IGNORECASE))
+
+def section_complete(text: str) -> bool:
+    return bool(re.search(r"Раздел:\s*\d+\D", strip_reasoning(text), re.IGNORECASE))
+
+def batch_complete(text: str) -> bool:
+    """Whether a complete JSON array has been received."""
+    answer = strip_reasoning(text)
+    start, end = answer.find("["), answer.rfind("]")
+    if start == -1 or end <= start:
+        return False
+    try:
+        json.loads(answer[start:end + 1])
+    except ValueError:
+        return False
+    return True
+
+def classify_with_llm(text: str, categories: list[str], model: str, output_dir: str,
+                      client: Optional[OllamaClient] = None,
+                      cache: Optional[LLMCache] = None) -> tuple[str, str, str]:
+    """
+    Classify a document using an LLM. Returns (category, description, raw_output).
+    - Uses a robust prompt with an explicit format and example.
+    - Uses regex for reliable extraction.
+    - Logs prompt and response.
+    - Handles malformed or empty output gracefully.
+    - Talks to Ollama over HTTP when a client is given, otherwise via `ollama run`.
+    - Reuses a cached response for an identical prompt when a cache is given.
+    - When streaming, stops the generation once both answer lines are complete.
+    """
+    prompt = (
+        "Ты — помощник приёмной комиссии. Определи категорию документа.\n"
+        "Ответь строго в формате:\nКатегория: <...>\nОписание: <...>\n\n"
+        "Категории:\n" + "\n".join(f"- {c}" for c in categories) +
+        f"\n\nТекст (фрагмент до {PROMPT_TEXT_CHARS} знаков):\n" + text[:PROMPT_TEXT_CHARS] +
+        "\n\nПример:\nКатегория: 1.1 диплом с отличием\nОписание: Диплом бакалавра с отличием\n"
+    )
+    meta = {}
+    out, err, cached = run_llm(prompt, model, client, cache, stop=classification_complete, meta=meta)
+    log_llm_call("classify_with_llm (cache)" if cached else "classify_with_llm", prompt, out, err, output_dir, meta)
 
     # Use regex for robust parsing (регистронезависимый)
-    cat_match = re.search(r"Категория:\s*(.+)", out, re.IGNORECASE)
-    desc_match = re.search(r"Описание:\s*(.+)", out, re.IGNORECASE)
+    answer = strip_reasoning(out)
+    cat_match = re.search(r"Категория:\s*(.+)", answer, re.IGNORECASE)
+    desc_match = re.search(r"Описание:\s*(.+)", answer, re.IGNORECASE)
     category = cat_match.group(1).strip() if cat_match else "Иное"
     description = desc_match.group(1).strip() if desc_match else ""
 
@@ -43,3 +362,237 @@ def classify_with_llm(text: str, categories: list[str], model: str, output_dir:
         category = "Иное"
         description = ""
     return category, description, out
+
+def short_category_name(category: str, words: int = 6) -> str:
+    """Category without its number and qualifiers: "2.1 статья в периодическом издании, ..." -> "статья в периодическом издании"."""
+    name = re.split(r",\s|\s\(|;|:", re.sub(r"^\d+\.\d+\s*", "", category))[0].split()
+    return " ".join(name[:words]) + ("…" if len(name) > words else "")
+
+def section_lines(categories: Optional[list[str]] = None) -> list[str]:
+    """Sections for the first-stage prompt, each followed by the short names of its categories."""
+    lines = []
+    for pfx, name in SECTION_PREFIXES.items():
+        members = list(dict.fromkeys(short_category_name(c) for c in categories or [] if c.startswith(pfx)))
+        lines.append(f"{pfx} {name}" + (": " + "; ".join(members) if members else ""))
+    return lines
+
+def classify_section_with_llm(text: str, model: str, output_dir: str,
+                              client: Optional[OllamaClient] = None,
+                              cache: Optional[LLMCache] = None,
+                              categories: Optional[list[str]] = None) -> Optional[str]:
+    """
+    First stage of hierarchical classification: pick a portfolio section.
+    Sections are described by the short names of their categories when categories are given
+    (e.g. IELTS and retraining sit under "Олимпиады и конкурсы", patents under "НИР и гранты").
+    Returns a SECTION_PREFIXES key ("1.", "2.", ...), "" for a document outside all sections,
+    or None if the answer could not be parsed.
+    """
+    prompt = (
+        "Ты — помощник приёмной комиссии. Определи раздел портфолио, к которому относится документ.\n"
+        "Ответь строго в формате:\nРаздел: <номер>\n\n"
+        "Разделы:\n" + "\n".join(section_lines(categories)) +
+        "\n0. Иное (документ не относится ни к одному разделу)" +
+        f"\n\nТекст (фрагмент до {PROMPT_TEXT_CHARS} знаков):\n" + text[:PROMPT_TEXT_CHARS] +
+        "\n\nПример:\nРаздел: 1\n"
+    )
+    meta = {}
+    out, err, cached = run_llm(prompt, model, client, cache, stop=section_complete, meta=meta)
+    log_llm_call("classify_section_with_llm (cache)" if cached else "classify_section_with_llm",
+                 prompt, out, err, output_dir, meta)
+    match = re.search(r"Раздел:\s*(\d+)", strip_reasoning(out), re.IGNORECASE)
+    if not match:
+        return None
+    prefix = f"{int(match.group(1))}."
+    if prefix in SECTION_PREFIXES:
+        return prefix
+    return "" if prefix == "0." else None
+
+def classify_hierarchical_with_llm(text: str, categories: list[str], model: str, output_dir: str,
+                                   client: Optional[OllamaClient] = None,
+                                   cache: Optional[LLMCache] = None) -> tuple[str, str, str]:
+    """
+    Two-stage classification. Returns (category, description, raw_output) like classify_with_llm.
+    - The model first picks one of the SECTION_PREFIXES sections, each listed with its categories' short names.
+    - Then classify_with_llm is asked with only that section's categories (plus "Иное").
+    - If the section answer cannot be parsed, or the document fits none of the section's
+      categories (a misrouted document), the flat prompt with all categories is used.
+    """
+    prefix = classify_section_with_llm(text, model, output_dir, client=client, cache=cache, categories=categories)
+    if prefix is None:
+        logging.warning("Section answer could not be parsed, using the flat category list")
+        return classify_with_llm(text, categories, model, output_dir, client=client, cache=cache)
+    if not prefix:
+        return "Иное", "", ""
+    subcategories = [c for c in categories if c.startswith(prefix)] + ["Иное"]
+    result = classify_with_llm(text, subcategories, model, output_dir, client=client, cache=cache)
+    if result[0] == "Иное":
+        logging.info(f"No category of section {prefix} fits, using the flat category list")
+        return classify_with_llm(text, categories, model, output_dir, client=client, cache=cache)
+    return result
+
+# Prompt modes selectable by llm_config "prompt_mode".
+CLASSIFIERS = {
+    "flat": classify_with_llm,
+    "hierarchical": classify_hierarchical_with_llm,
+}
+
+def get_classifier_for_mode(mode: str):
+    """Classification function for a prompt_mode; unknown modes fall back to flat with a warning."""
+    if mode not in CLASSIFIERS:
+        logging.warning(f"Unknown prompt_mode '{mode}', using flat")
+    return CLASSIFIERS.get(mode, classify_with_llm)
+
+class ModelRouter:
+    """
+    Sends each document to a small model first and escalates to the large one only when needed:
+    the answer is unparseable, names a category outside categories.json, or differs from the
+    category the claimed type resolves to. Answers are mapped to category names by their number
+    ("1.1 диплом с отличием" -> the full 1.1 name). Keeps per-model call counts and latency for
+    the run summary. Can be called like classify_with_llm; `model` is the large model.
+    """
+
+    def __init__(self, small_model: str, classify=classify_with_llm, escalate_on_mismatch: bool = True):
+        self.small_model = small_model
+        self.classify = classify
+        self.escalate_on_mismatch = escalate_on_mismatch
+        self.calls = {}
+        self.latency = {}
+        self.escalations = 0
+        self._resolvers = {}
+        self._lock = threading.Lock()
+
+    def _run(self, model: str, text: str, categories: list[str], output_dir: str, client, cache):
+        start = time.perf_counter()
+        category, description, raw = self.classify(text, categories, model, output_dir, client=client, cache=cache)
+        with self._lock:
+            self.calls[model] = self.calls.get(model, 0) + 1
+            self.latency[model] = self.latency.get(model, 0.0) + time.perf_counter() - start
+        return canonical_category(category, categories) or category, description, raw
+
+    def _resolve(self, claimed: str, categories: list[str]) -> Optional[str]:
+        """Category the claimed type stands for; resolvers are built once per category list."""
+        key = tuple(categories)
+        with self._lock:
+            if key not in self._resolvers:
+                self._resolvers[key] = ClaimedTypeResolver(categories)
+            resolver = self._resolvers[key]
+        return resolver.resolve(claimed)
+
+    def escalation_reason(self, result: tuple[str, str, str], categories: list[str],
+                          claimed: Optional[str]) -> Optional[str]:
+        category, _, raw = result
+        if category == "Иное" and not re.search(r"Категория:", strip_reasoning(raw), re.IGNORECASE):
+            return "unparseable answer"
+        if category not in categories:
+            return f"unknown category '{category}'"
+        if self.escalate_on_mismatch and claimed:
+            # A claim that does not resolve to any category cannot be checked, so it does not escalate
+            target = self._resolve(claimed, categories)
+            if target and category != target:
+                return f"differs from the claimed type '{target}'"
+        return None
+
+    def __call__(self, text: str, categories: list[str], model: str, output_dir: str,
+                 client: Optional[OllamaClient] = None, cache: Optional[LLMCache] = None,
+                 claimed: Optional[str] = None) -> tuple[str, str, str]:
+        result = self._run(self.small_model, text, categories, output_dir, client, cache)
+        reason = self.escalation_reason(result, categories, claimed)
+        if reason is None or model == self.small_model:
+            return result
+        logging.info(f"Escalating from {self.small_model} to {model}: {reason}")
+        with self._lock:
+            self.escalations += 1
+        return self._run(model, text, categories, output_dir, client, cache)
+
+    def classify_many(self, texts: list[str], categories: list[str], model: str, output_dir: str,
+                      client: Optional[OllamaClient] = None, cache: Optional[LLMCache] = None,
+                      claimed: Optional[list[str]] = None) -> list[tuple[str, str, str]]:
+        """Route several documents one by one; same result shape as classify_batch_with_llm."""
+        claimed = claimed or [None] * len(texts)
+        return [self(t, categories, model, output_dir, client=client, cache=cache, claimed=c)
+                for t, c in zip(texts, claimed)]
+
+    def stats(self) -> str:
+        parts = [
+            f"{model}: {calls} calls, {self.latency[model] / calls:.2f}s avg"
+            for model, calls in self.calls.items()
+        ]
+        return f"Model routing: {'; '.join(parts) or 'no calls'}; {self.escalations} escalated"
+
+def make_router(llm_cfg: dict, classify=classify_with_llm) -> Optional[ModelRouter]:
+    """Build the model router described by llm_config.json, or None when `small_model` is not set."""
+    small_model = llm_cfg.get("small_model")
+    if not small_model:
+        return None
+    return ModelRouter(small_model, classify, bool(llm_cfg.get("route_on_mismatch", True)))
+
+def _parse_batch_answer(out: str, count: int, categories: list[str]) -> dict[int, tuple[str, str, str]]:
+    """
+    Parse a JSON array of {"id", "category", "description"} objects. Categories are mapped to
+    `categories` by canonical_category; invalid items and items with an unknown category are dropped.
+    """
+    start, end = out.find("["), out.rfind("]")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        items = json.loads(out[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        idx, category, description = item.get("id"), item.get("category"), item.get("description", "")
+        if not isinstance(idx, int) or not 1 <= idx <= count or idx in parsed:
+            continue
+        if not isinstance(category, str) or not category.strip() or not isinstance(description, str):
+            continue
+        canonical = canonical_category(category, categories)
+        if canonical is None:
+            logging.warning(f"Batch answer for document {idx} has unknown category: {category.strip()}")
+            continue
+        parsed[idx] = (canonical, description.strip(), json.dumps(item, ensure_ascii=False))
+    return parsed
+
+def classify_batch_with_llm(texts: list[str], categories: list[str], model: str, output_dir: str,
+                            client: Optional[OllamaClient] = None,
+                            cache: Optional[LLMCache] = None,
+                            single=classify_with_llm) -> list[tuple[str, str, str]]:
+    """
+    Classify several documents with one prompt. Returns a (category, description, raw_output) per text, in order.
+    - The category list is sent once for the whole batch.
+    - The model answers with a JSON array, one object per document.
+    - Documents whose item is missing, malformed or names a category that is not in the list
+      are classified one by one with `single`.
+    """
+    if len(texts) <= 1:
+        return [single(t, categories, model, output_dir, client=client, cache=cache) for t in texts]
+    prompt = (
+        "Ты — помощник приёмной комиссии. Определи категорию каждого документа.\n"
+        "Ответь строго JSON-массивом, по одному объекту на документ, без пояснений:\n"
+        '[{"id": <номер документа>, "category": "<...>", "description": "<...>"}]\n\n'
+        "Категории:\n" + "\n".join(f"- {c}" for c in categories) + "\n"
+    )
+    for i, text in enumerate(texts, 1):
+        prompt += f"\nДокумент {i}. Текст (фрагмент до {BATCH_TEXT_CHARS} знаков):\n" + text[:BATCH_TEXT_CHARS] + "\n"
+    # The example names a real category, so a model that copies it still gives a valid answer
+    example = canonical_category("1.1", categories) or categories[0]
+    prompt += (
+        '\nПример:\n' + json.dumps([{"id": 1, "category": example, "description": "Диплом бакалавра с отличием"}],
+                                     ensure_ascii=False) + "\n"
+    )
+    meta = {}
+    max_tokens = client.max_tokens * len(texts) if client is not None and client.max_tokens else None
+    out, err, cached = run_llm(prompt, model, client, cache, stop=batch_complete, max_tokens=max_tokens, meta=meta)
+    log_llm_call("classify_batch_with_llm (cache)" if cached else "classify_batch_with_llm",
+                 prompt, out, err, output_dir, meta)
+
+    parsed = _parse_batch_answer(strip_reasoning(out), len(texts), categories)
+    if len(parsed) < len(texts):
+        logging.warning(f"Batch answer covered {len(parsed)} of {len(texts)} documents, classifying the rest one by one")
+    return [
+        parsed.get(i) or single(text, categories, model, output_dir, client=client, cache=cache)
+        for i, text in enumerate(texts, 1)
+    ]
@@ -1,11 +1,15 @@
 import os
 import json
+import re
+from collections import deque
+from typing import Iterable, NamedTuple, Optional
 # import subprocess  # No longer needed
 from src.core.logger import log_llm_call
 
 def extract_person_name(text: str, expected_name: str = "", model: str = "deepseek-r1:1.5b", output_dir: str = "data/output") -> dict:
     """
-    Checks if the expected_name exists in the text. Returns a dict with keys:
+    Checks if the expected_name exists in the text (exactly, or via find_name_fuzzy for OCR errors,
+    look-alike Latin letters and other grammatical cases). Returns a dict with keys:
     - full_name: the expected_name if found, else empty string
     - match_with_expected: True if found, else False
     - comment: explanation
@@ -13,8 +17,269 @@ def extract_person_name(text: str, expected_name: str = "", model: str = "deepse
     if not expected_name:
         return {"full_name": "", "match_with_expected": False, "comment": "Ожидаемое имя не указано"}
     found = expected_name in text
+    if not found:
+        match = find_name_fuzzy(text, expected_name)
+        if match:
+            return {
+                "full_name": expected_name,
+                "match_with_expected": True,
+                "comment": f"Имя найдено приблизительно: «{text[match.start:match.end]}» (ошибок: {match.distance})"
+            }
     return {
         "full_name": expected_name if found else "",
         "match_with_expected": found,
         "comment": "Имя найдено в тексте" if found else "Имя не найдено в тексте"
     }
+
+def normalize_name_text(s: str) -> str:
+    """Lowercase, collapse whitespace and glue initials ("И. И. Иванов" -> "и.и.иванов")."""
+    return re.sub(r"\.\s", ".", " ".join(s.lower().split()))
+
+def name_variants(full_name: str) -> list[str]:
+    """
+    Normalized spellings of "Фамилия Имя Отчество" to look for in documents:
+    full name in both orders, surname with first name, surname with initials on either side.
+    The surname alone is not used: it matches too many other people.
+    """
+    parts = normalize_name_text(full_name).replace(".", " ").split()
+    if len(parts) < 2:
+        return parts
+    surname, given = parts[0], parts[1:]
+    initials = "".join(f"{p[0]}." for p in given)
+    variants = [
+        " ".join(parts),
+        " ".join(given + [surname]),
+        f"{surname} {given[0]}",
+        f"{given[0]} {surname}",
+        f"{surname} {initials}",
+        f"{initials}{surname}",
+    ]
+    return list(dict.fromkeys(variants))
+
+class NameMatch(NamedTuple):
+    name: str        # applicant's name as given to NameIndex
+    variant: str     # the spelling that was found
+    start: int       # offsets in normalize_name_text(text)
+    end: int
+
+class NameIndex:
+    """
+    Aho-Corasick automaton over the name variants of many applicants.
+    A document is scanned once, whatever the number of applicants; matches must start and end
+    at word boundaries. Names added after a search rebuild the failure links on the next search.
+    """
+    def __init__(self, names: Iterable[str] = ()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._own = [[]]     # patterns ending exactly at each state
+        self._out = [[]]     # plus those of its failure chain, recomputed by _build
+        self._patterns = []
+        self._built = True
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len({name for name, _ in self._patterns})
+
+    def add(self, name: str) -> None:
+        for variant in name_variants(name):
+            state = 0
+            for ch in variant:
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._own.append([])
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            self._own[state].append(len(self._patterns))
+            self._patterns.append((name, variant))
+        self._built = False
+
+    def _build(self) -> None:
+        """Breadth-first failure links; each state also reports the patterns of its failure chain."""
+        self._out = [list(own) for own in self._own]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._own[nxt] + self._out[self._fail[nxt]]
+                queue.append(nxt)
+        self._built = True
+
+    def search(self, text: str) -> list[NameMatch]:
+        """All occurrences of any applicant's name variant in text."""
+        if not self._built:
+            self._build()
+        text = normalize_name_text(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for p in out[state]:
+                name, variant = self._patterns[p]
+                start, end = i + 1 - len(variant), i + 1
+                # Initials are glued to the next word by normalize_name_text, so a trailing dot is a boundary too
+                if (start == 0 or not text[start - 1].isalnum()) and (
+                        end == len(text) or variant.endswith(".") or not text[end].isalnum()):
+                    matches.append(NameMatch(name, variant, start, end))
+        return matches
+
+    def find(self, text: str) -> dict[str, list[NameMatch]]:
+        """Applicants whose name occurs in text, with their matches, in order of first occurrence."""
+        found = {}
+        for match in self.search(text):
+            found.setdefault(match.name, []).append(match)
+        return found
+
+# OCR look-alikes (Latin letters, digits) folded to the Cyrillic letter they stand for, plus ё -> е
+HOMOGLYPHS = str.maketrans("aвcehkmoptxyb03ё", "авсенкмортхувозе")
+# Case endings of names, longest first: "Иванову Ивану Ивановичу" and "Иванов Иван Иванович" share stems
+NAME_ENDINGS = ("ыми", "ими", "ому", "ему", "ого", "его", "ами", "ями", "ой", "ей", "ую", "юю", "ым", "им",
+                "ом", "ем", "ою", "ею", "ах", "ях", "а", "я", "у", "ю", "е", "ы", "и", "ь")
+MIN_STEM = 3
+NAME_ERROR_RATE = 0.2  # allowed edits per character of each word of the full name
+# Stems of patronymics: "Петрович", "Петровна" -> "петровн", "Ильинична" -> "ильиничн"
+PATRONYMIC_RE = re.compile(r"(?:ич|вн|чн)$")
+
+class FuzzyMatch(NamedTuple):
+    start: int      # offsets in the original text
+    end: int
+    distance: int   # edit distance between the normalized name and the normalized fragment
+
+def stem_name_word(word: str) -> str:
+    for ending in NAME_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+def normalize_fuzzy(text: str) -> tuple[str, list[int], list[int]]:
+    """
+    Words of text, lowercased, homoglyph-folded and stemmed, joined by single spaces. Initials keep
+    their dot ("И.И. Иванов" -> "и. и. иванов"), so they do not match one-letter words such as "и".
+    Also returns, for every character of the result, the original offset it starts at and the original
+    offset a match ending on it ends at (the end of the word, so a stripped ending is included).
+    """
+    parts, starts, ends = [], [], []
+    for word in re.finditer(r"(?<!\w)\w\.|\w+", text):
+        stem = stem_name_word(word.group().lower().translate(HOMOGLYPHS))
+        if parts:
+            parts.append(" ")
+            starts.append(word.start())
+            ends.append(ends[-1])
+        parts.append(stem)
+        starts.extend(min(word.start() + i, word.end() - 1) for i in range(len(stem)))
+        ends.extend(min(word.start() + i + 1, word.end()) for i in range(len(stem) - 1))
+        ends.append(word.end())
+    return "".join(parts), starts, ends
+
+def _myers_scan(pattern: str, text: str, max_distance: int, anchored: bool = False) -> Iterable[tuple[int, int]]:
+    """
+    (end, distance) for every position of text where some substring ending there is within max_distance
+    edits of pattern (anchored: the prefix text[:end] itself). Myers' bit-parallel algorithm: one pass,
+    a few integer operations per character.
+    """
+    m = len(pattern)
+    mask, high = (1 << m) - 1, 1 << (m - 1)
+    peq = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    pv, mv, score = mask, 0, m
+    for j, ch in enumerate(text):
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | anchored) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score <= max_distance:
+            yield j + 1, score
+
+def _edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+def fuzzy_search(pattern: str, text: str, max_distance: int, whole_words: bool = False) -> list[tuple[int, int, int]]:
+    """
+    Non-overlapping (start, end, distance) occurrences of pattern in text with at most max_distance edits.
+    Each run of accepted end positions gives its best end; the start is found by scanning the few
+    characters before it backwards with the reversed pattern. whole_words: occurrences must start and
+    end at a space or the edge of text (as in normalize_fuzzy output).
+    """
+    if not pattern:
+        return []
+    runs = []
+    for end, distance in _myers_scan(pattern, text, max_distance):
+        if whole_words and end < len(text) and text[end] != " ":
+            continue
+        if runs and end == runs[-1][2] + 1:
+            best_end, best, _ = runs[-1]
+            runs[-1] = (end, distance, end) if distance < best else (best_end, best, end)
+        else:
+            runs.append((end, distance, end))
+    matches = []
+    for end, distance, _ in runs:
+        window = max(0, end - len(pattern) - max_distance)
+        if matches and window < matches[-1][1]:
+            window = matches[-1][1]
+        reverse = text[window:end][::-1]
+        starts = [(d, -length) for length, d in _myers_scan(pattern[::-1], reverse, max_distance, anchored=True)
+                  if not whole_words or end - length == 0 or text[end - length - 1] == " "]
+        if starts:
+            d, length = min(starts)
+            matches.append((end + length, end, d))
+    return matches
+
+def find_name_fuzzy(text: str, full_name: str, error_rate: float = NAME_ERROR_RATE) -> Optional[FuzzyMatch]:
+    """
+    Closest occurrence of full_name in OCR text, trying the spellings of name_variants in order.
+    Only the spelled-out full name (three or more words) may contain OCR errors, at most
+    int(len(word) * error_rate) edits in each word; surname with first name or initials must match
+    exactly after normalization. Surname with first name is rejected when another patronymic follows
+    it ("Иванов Иван Петрович" is not "Иванов Иван Иванович"). Matches cover whole words.
+    Returns None if nothing is found.
+    """
+    normalized, starts, ends = normalize_fuzzy(text)
+    full = normalize_fuzzy(full_name)[0].split()
+    patronymic = full[2] if len(full) >= 3 else None
+    for variant in name_variants(full_name):
+        pattern, _, _ = normalize_fuzzy(variant)
+        words = pattern.split()
+        if len(words) >= 3 and all(len(w) > 1 and not w.endswith(".") for w in words):
+            budgets = [int(len(w) * error_rate) for w in words]
+        else:
+            budgets = [0] * len(words)
+        found = []
+        for start, end, _ in fuzzy_search(pattern, normalized, sum(budgets), whole_words=True):
+            fragment = normalized[start:end].split()
+            if len(fragment) != len(words):
+                continue
+            distances = [_edit_distance(f, w) for f, w in zip(fragment, words)]
+            if not all(d <= b for d, b in zip(distances, budgets)):
+                continue
+            following = normalized[end + 1:].split(" ", 1)[0]
+            if (patronymic and patronymic not in words and PATRONYMIC_RE.search(following)
+                    and _edit_distance(following, patronymic) > int(len(patronymic) * error_rate)):
+                continue
+            found.append(FuzzyMatch(starts[start], ends[end - 1], sum(distances)))
+        if found:
+            return min(found, key=lambda m: m.distance)
+    return None
@@ -1,62 +1,714 @@
 import fitz
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image, ImageEnhance, ImageFilter
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from itertools import chain
+from typing import Callable, Iterable, Iterator, Optional
+import atexit
+import json
 import os
 import logging
+import threading
+from src.core.text_cache import TextCache
 
-def preprocess_image(img: Image.Image, tesseract_lang: str) -> Image.Image:
-    """Preprocess an image for OCR, including grayscale, contrast, binarization, and rotation correction."""
+TESSERACT_CONFIG = "--oem 1 --psm 6"
+# Bump whenever preprocessing or page extraction change their output, to invalidate cached text.
+PREPROCESS_VERSION = "2"
+# Pages whose text layer has fewer characters than this are OCR'd instead.
+MIN_TEXT_LAYER_CHARS = 20
+# Orientation probe: longest side of the downscaled page, and how much stronger the
+# row profile must vary than the column profile for the page to count as upright.
+ORIENTATION_PROBE_SIZE = 800
+ORIENTATION_MARGIN = 1.25
+# Up/down check: vertical strips the probe is cut into, text lines needed for a verdict, and
+# how far from an even split the share of lines with ink above their x-height band must be.
+UPRIGHT_STRIPS = 6
+UPRIGHT_MIN_LINES = 8
+UPRIGHT_VOTE_MARGIN = 0.12
+# Language detection: minimum letters to judge a script, share of one script needed to
+# drop the other language pack, and longest side of the low-resolution probe image.
+LANG_DETECT_MIN_LETTERS = 20
+LANG_DETECT_RATIO = 0.9
+LANG_PROBE_SIZE = 1200
+# NumPy preprocessing: local-mean window and offset for adaptive binarization, and
+# the skew search range/step (degrees) with the subsampled size used to score it.
+ADAPTIVE_BLOCK = 31
+ADAPTIVE_OFFSET = 10
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.25
+DESKEW_PROBE_SIZE = 1000
+
+class OcrBackend:
+    """Interface of an OCR engine: plain text and OSD output for an in-memory PIL image."""
+
+    name = ""
+
+    def image_to_string(self, img: Image.Image, tesseract_lang: str) -> str:
+        raise NotImplementedError
+
+    def image_to_osd(self, img: Image.Image, tesseract_lang: str) -> str:
+        raise NotImplementedError
+
+class PytesseractBackend(OcrBackend):
+    """Runs the tesseract binary through pytesseract (one subprocess and temp file per call)."""
+
+    name = "pytesseract"
+
+    def image_to_string(self, img: Image.Image, tesseract_lang: str) -> str:
+        return pytesseract.image_to_string(img, lang=tesseract_lang, config=TESSERACT_CONFIG)
+
+    def image_to_osd(self, img: Image.Image, tesseract_lang: str) -> str:
+        return pytesseract.image_to_osd(img, lang=tesseract_lang)
+
+class TesserocrBackend(OcrBackend):
+    """In-process libtesseract engine via tesserocr.
+
+    One PyTessBaseAPI per language set is created on first use and kept for the
+    life of the process, so the traineddata is loaded once per worker and images
+    are passed in memory instead of through temp files.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._apis = {}
+
+    def _api(self, tesseract_lang: str, psm):
+        key = (tesseract_lang, psm)
+        if key not in self._apis:
+            self._apis[key] = self._tesserocr.PyTessBaseAPI(
+                lang=tesseract_lang, psm=psm, oem=self._tesserocr.OEM.LSTM_ONLY
+            )
+        return self._apis[key]
+
+    def image_to_string(self, img: Image.Image, tesseract_lang: str) -> str:
+        api = self._api(tesseract_lang, self._tesserocr.PSM.SINGLE_BLOCK)
+        api.SetImage(img)
+        return api.GetUTF8Text()
+
+    def image_to_osd(self, img: Image.Image, tesseract_lang: str) -> str:
+        api = self._api(tesseract_lang, self._tesserocr.PSM.OSD_ONLY)
+        api.SetImage(img)
+        osd = api.DetectOrientationScript()
+        if not osd:
+            raise RuntimeError("OSD failed")
+        return f"Orientation in degrees: {osd['orient_deg']}\nRotate: {(360 - osd['orient_deg']) % 360}\n"
+
+OCR_BACKENDS = {"pytesseract": PytesseractBackend, "tesserocr": TesserocrBackend}
+_backends = {}
+
+def get_backend(name: str = "pytesseract") -> OcrBackend:
+    """Return this process's OCR backend, creating it on first use.
+
+    Falls back to pytesseract when the requested engine is not installed.
+    """
+    if name not in _backends:
+        try:
+            _backends[name] = OCR_BACKENDS[name]()
+        except (ImportError, KeyError, RuntimeError) as e:
+            logging.warning(f"OCR backend '{name}' unavailable ({e}), using pytesseract")
+            _backends[name] = PytesseractBackend()
+    return _backends[name]
+
+def binarize(img: Image.Image) -> Image.Image:
+    """Grayscale, contrast boost and fixed-threshold binarization of a page image."""
     gray = img.convert("L")
     enhancer = ImageEnhance.Contrast(gray)
     img_enh = enhancer.enhance(2.0)
-    img_bw = img_enh.point(lambda x: 0 if x < 128 else 255, mode="1")
+    return img_enh.point(lambda x: 0 if x < 128 else 255, mode="1")
+
+def line_extent_votes(ink: np.ndarray, strips: int = UPRIGHT_STRIPS) -> list[float]:
+    """Per text line, (ink above - ink below) / both around its densest (x-height) band.
+
+    The page is cut into vertical strips so table columns and stamps do not merge lines;
+    rows that are mostly ink (rules, box borders) are ignored. Capitals, digits and
+    ascenders put more ink above the band than descenders put below it, so upright
+    text votes mostly positive and upside-down text mostly negative.
+    """
+    height, width = ink.shape
+    votes = []
+    for s in range(strips):
+        strip = ink[:, s * width // strips:(s + 1) * width // strips]
+        rows = strip.sum(axis=1, dtype=np.float64)
+        rows[rows > 0.6 * strip.shape[1]] = 0
+        if not rows.any():
+            continue
+        in_line = np.concatenate(([False], rows > max(1.0, 0.05 * rows.max()), [False]))
+        edges = np.flatnonzero(np.diff(in_line.astype(np.int8)))
+        for top, bottom in zip(edges[::2], edges[1::2]):
+            if not 6 <= bottom - top <= 60:
+                continue
+            line = rows[top:bottom]
+            core = np.flatnonzero(line >= 0.5 * line.max())
+            above, below = line[:core[0]].sum(), line[core[-1] + 1:].sum()
+            if above + below > 0:
+                votes.append((above - below) / (above + below))
+    return votes
+
+def estimate_orientation(img_bw: Image.Image) -> Optional[int]:
+    """Cheap orientation estimate from NumPy projection profiles of a binarized page.
+
+    Horizontal text lines make the row profile alternate between ink and gaps, so
+    its coefficient of variation is much higher than the column profile's. For such
+    pages, line_extent_votes tells upright (0) from upside-down (180). Blank pages
+    are 0. Returns None when the text runs vertically or the up/down votes are too
+    even, so telling 90 from 270 (or 0 from 180) is left to Tesseract OSD.
+    """
+    small = img_bw.convert("L")
+    small.thumbnail((ORIENTATION_PROBE_SIZE, ORIENTATION_PROBE_SIZE))
+    ink = np.asarray(small) < 128
+    if ink.mean() < 0.001:
+        return 0
+    rows = ink.sum(axis=1, dtype=np.float64)
+    cols = ink.sum(axis=0, dtype=np.float64)
+    row_cv = rows.std() / rows.mean()
+    col_cv = cols.std() / cols.mean()
+    if row_cv < ORIENTATION_MARGIN * col_cv:
+        return None
+    votes = line_extent_votes(ink)
+    if len(votes) < UPRIGHT_MIN_LINES:
+        return None
+    upright = np.mean(np.asarray(votes) > 0)
+    if upright >= 0.5 + UPRIGHT_VOTE_MARGIN:
+        return 0
+    if upright <= 0.5 - UPRIGHT_VOTE_MARGIN:
+        return 180
+    return None
+
+def osd_orientation(img_bw: Image.Image, tesseract_lang: str, backend: str = "pytesseract") -> int:
+    """Rotation angle reported by a full Tesseract OSD pass, 0 if OSD fails."""
     try:
-        osd = pytesseract.image_to_osd(img_bw, lang=tesseract_lang)
-        for line in osd.splitlines():
-            if line.startswith("Rotate:"):
-                angle = int(line.split(":")[1].strip())
-                if angle != 0:
-                    img_bw = img_bw.rotate(-angle, expand=True)
-                break
+        osd = get_backend(backend).image_to_osd(img_bw, tesseract_lang)
     except Exception:
-        pass
+        return 0
+    for line in osd.splitlines():
+        if line.startswith("Rotate:"):
+            return int(line.split(":")[1].strip())
+    return 0
+
+def detect_orientation(img_bw: Image.Image, tesseract_lang: str, backend: str = "pytesseract") -> int:
+    """Rotation angle of a binarized page: projection profiles first, OSD only when ambiguous."""
+    angle = estimate_orientation(img_bw)
+    if angle is not None:
+        return angle
+    logging.debug("Orientation ambiguous, running Tesseract OSD")
+    return osd_orientation(img_bw, tesseract_lang, backend)
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Otsu's global threshold for an 8-bit grayscale array, from its histogram."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    mass_bg = np.cumsum(hist * levels)
+    mean_bg = mass_bg / np.maximum(weight_bg, 1)
+    mean_fg = (mass_bg[-1] - mass_bg) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+def adaptive_ink_mask(gray: np.ndarray, block: int = ADAPTIVE_BLOCK, offset: int = ADAPTIVE_OFFSET) -> np.ndarray:
+    """Ink mask from a local-mean threshold (separable box filter via cumulative sums).
+
+    A pixel is ink when it is darker than both the Otsu threshold and its
+    block x block neighbourhood mean minus offset, which keeps uneven lighting
+    and stamps from flooding whole regions.
+    """
+    r = block // 2
+    padded = np.pad(gray, ((r + 1, r), (r + 1, r)), mode="edge").astype(np.int32)
+    acc = padded.cumsum(axis=0)
+    acc = acc[block:] - acc[:-block]
+    acc = acc.cumsum(axis=1)
+    acc = acc[:, block:] - acc[:, :-block]
+    local_mean = acc / (block * block)
+    return (gray < local_mean - offset) & (gray <= otsu_threshold(gray))
+
+def remove_specks(ink: np.ndarray) -> np.ndarray:
+    """Drop isolated ink pixels (at most one ink neighbour in their 3x3 window)."""
+    padded = np.pad(ink, 1).astype(np.uint8)
+    h, w = ink.shape
+    neighbours = sum(
+        padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx
+    )
+    return ink & (neighbours > 1)
+
+def estimate_skew(ink: np.ndarray, max_angle: float = DESKEW_MAX_ANGLE, step: float = DESKEW_STEP) -> float:
+    """Skew angle in degrees that makes text lines horizontal, by projection profiles.
+
+    Ink pixel coordinates are sheared for every candidate angle and the row
+    histogram with the sharpest peaks (largest sum of squares) wins. Works on
+    a strided subsample, so the cost does not depend on the page resolution.
+    """
+    stride = max(1, max(ink.shape) // DESKEW_PROBE_SIZE)
+    ys, xs = np.nonzero(ink[::stride, ::stride])
+    if len(ys) < 100:
+        return 0.0
+    ys = ys.astype(np.float64)
+    xs = xs.astype(np.float64)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rows = np.round(ys + xs * np.tan(np.radians(angle))).astype(np.int64)
+        hist = np.bincount(rows - rows.min())
+        score = float(np.dot(hist, hist))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+def preprocess_image_numpy(img: Image.Image, tesseract_lang: str, angle: Optional[int] = None,
+                           backend: str = "pytesseract") -> Image.Image:
+    """NumPy preprocessing: adaptive/Otsu binarization, speck removal, orientation and deskew.
+
+    Everything runs on whole arrays; the only PIL work is the final rotation.
+    """
+    gray = np.asarray(img.convert("L"))
+    ink = remove_specks(adaptive_ink_mask(gray))
+    img_bw = Image.fromarray(~ink)
+    if angle is None:
+        angle = detect_orientation(img_bw, tesseract_lang, backend)
+    if angle != 0:
+        img_bw = img_bw.rotate(-angle, expand=True)
+        ink = np.asarray(img_bw.convert("L")) < 128
+    skew = estimate_skew(ink)
+    if skew:
+        img_bw = img_bw.convert("L").rotate(-skew, expand=True, fillcolor=255).convert("1")
+    return img_bw
+
+def preprocess_image(img: Image.Image, tesseract_lang: str, angle: Optional[int] = None,
+                     backend: str = "pytesseract") -> Image.Image:
+    """Preprocess an image for OCR, including grayscale, contrast, binarization, and rotation correction.
+
+    If angle is None the page orientation is detected; otherwise the given angle is applied.
+    """
+    img_bw = binarize(img)
+    if angle is None:
+        angle = detect_orientation(img_bw, tesseract_lang, backend)
+    if angle != 0:
+        img_bw = img_bw.rotate(-angle, expand=True)
     return img_bw.filter(ImageFilter.SHARPEN)
 
-def extract_text(filepath: str, tesseract_lang: str) -> str:
-    """Extract text from a PDF file using PyMuPDF or OCR as fallback."""
+PREPROCESSORS = {"legacy": preprocess_image, "numpy": preprocess_image_numpy}
+
+def ocr_page(img: Image.Image, tesseract_lang: str, angle: Optional[int] = None,
+             preprocessing: str = "legacy", backend: str = "pytesseract") -> str:
+    """OCR a single page image, falling back to the raw image if preprocessing fails."""
+    engine = get_backend(backend)
     try:
-        doc = fitz.open(filepath)
-        txt = "".join(page.get_text() + "\n" for page in doc)
-        if txt.strip():
-            logging.info(f"Text extracted by PyMuPDF: {os.path.basename(filepath)}")
-            return txt
-    except Exception as e:
-        logging.error(f"PyMuPDF error for {os.path.basename(filepath)}: {e}")
+        pre = PREPROCESSORS[preprocessing](img, tesseract_lang, angle, backend)
+        return engine.image_to_string(pre, tesseract_lang)
+    except Exception:
+        return engine.image_to_string(img, tesseract_lang)
 
-    logging.info(f"OCR fallback for {os.path.basename(filepath)}")
+def script_language(text: str, tesseract_lang: str) -> str:
+    """Narrowest configured language set for a text, by its Cyrillic vs. Latin letter ratio.
+
+    Returns "rus" or "eng" when one script clearly dominates and is part of
+    tesseract_lang, and tesseract_lang itself (the combined mode) otherwise.
+    """
+    cyrillic = sum(1 for ch in text if "\u0400" <= ch <= "\u04ff")
+    latin = sum(1 for ch in text if ch.isascii() and ch.isalpha())
+    total = cyrillic + latin
+    if total < LANG_DETECT_MIN_LETTERS:
+        return tesseract_lang
+    langs = tesseract_lang.split("+")
+    if "rus" in langs and cyrillic / total >= LANG_DETECT_RATIO:
+        return "rus"
+    if "eng" in langs and latin / total >= LANG_DETECT_RATIO:
+        return "eng"
+    return tesseract_lang
+
+def page_language(img: Image.Image, tesseract_lang: str, backend: str = "pytesseract") -> str:
+    """Pick the OCR language for a page from a low-resolution probe OCR."""
+    if "+" not in tesseract_lang:
+        return tesseract_lang
+    probe = img.convert("L")
+    probe.thumbnail((LANG_PROBE_SIZE, LANG_PROBE_SIZE))
     try:
-        images = convert_from_path(filepath, dpi=300)
-    except Exception as e:
-        logging.error(f"PDF→image conversion error: {e}")
-        return ""
+        return script_language(get_backend(backend).image_to_string(probe, tesseract_lang), tesseract_lang)
+    except Exception:
+        return tesseract_lang
+
+def recognize_page(img: Image.Image, tesseract_lang: str, angle: Optional[int] = None,
+                   preprocessing: str = "legacy", backend: str = "pytesseract",
+                   lang_detect: bool = False) -> tuple[str, str]:
+    """OCR a page, optionally narrowing the language set first. Returns (text, language used)."""
+    if lang_detect:
+        tesseract_lang = page_language(img, tesseract_lang, backend)
+    return ocr_page(img, tesseract_lang, angle, preprocessing, backend), tesseract_lang
 
-    ocr_text = ""
-    config = "--oem 1 --psm 6"
-    for i, img in enumerate(images):
+def resolve_workers(workers: int) -> int:
+    """Return the effective OCR worker count; 0 or less means one worker per CPU core."""
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+def ocr_options(cfg: dict) -> dict:
+    """Map tesseract_config.json settings onto extract_text keyword arguments."""
+    options = {
+        "workers": int(cfg.get("workers", 1)),
+        "dpi": int(cfg.get("dpi", 300)),
+        "min_text_chars": int(cfg.get("min_text_chars", MIN_TEXT_LAYER_CHARS)),
+        "rasterizer": cfg.get("rasterizer", "pymupdf"),
+        "orientation": cfg.get("orientation", "page"),
+        "preprocessing": cfg.get("preprocessing", "legacy"),
+        "backend": cfg.get("ocr_backend", "pytesseract"),
+        "lang_detect": bool(cfg.get("lang_detect", False)),
+    }
+    if cfg.get("cache_dir"):
+        max_bytes = int(cfg.get("cache_max_mb", 200)) * 1024 * 1024
+        options["cache"] = TextCache(cfg["cache_dir"], max_bytes)
+    return options
+
+def iter_page_images(filepath: str, page_numbers: Iterable[int], dpi: int = 300) -> Iterator[tuple[int, Image.Image]]:
+    """Rasterize the given 1-based PDF pages one at a time, yielding (page_number, image).
+
+    Only the current page is held in memory; pages that fail to convert are skipped.
+    """
+    for number in page_numbers:
+        try:
+            images = convert_from_path(filepath, dpi=dpi, first_page=number, last_page=number)
+        except Exception as e:
+            logging.error(f"PDF→image conversion error on page {number}: {e}")
+            continue
+        for img in images:
+            yield number, img
+
+def iter_pixmap_images(doc: "fitz.Document", page_numbers: Iterable[int], dpi: int = 300) -> Iterator[tuple[int, Image.Image]]:
+    """Render the given 1-based pages of an open PyMuPDF document, yielding (page_number, image).
+
+    Pages are rendered in memory, so there is no poppler subprocess, no temp files and
+    no second parse of the PDF. The image gets its own copy of the pixels (PIL cannot
+    map packed RGB without copying), and the pixmap is freed as soon as it is converted.
+    """
+    for number in page_numbers:
         try:
-            pre = preprocess_image(img, tesseract_lang)
-            page = pytesseract.image_to_string(pre, lang=tesseract_lang, config=config)
-        except Exception:
-            page = pytesseract.image_to_string(img, lang=tesseract_lang, config=config)
-        ocr_text += page + "\n"
+            pix = doc[number - 1].get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+        except Exception as e:
+            logging.error(f"PDF→image rendering error on page {number}: {e}")
+            continue
+        img = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+        del pix
+        yield number, img
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared OCR worker pool, created on first use and reused across documents.
+
+    Workers keep their OCR backend (and its loaded language models) between documents.
+    The pool only grows: a request for more workers replaces it with a larger one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._max_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+@atexit.register
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _ocr_pages(images: Iterator[tuple[int, Image.Image]], tesseract_lang: str, workers: int,
+               orientation: str = "page", preprocessing: str = "legacy",
+               backend: str = "pytesseract", lang_detect: bool = False,
+               window: Optional[int] = None) -> Iterator[tuple[int, str]]:
+    """OCR (page_number, image) pairs in order on the shared pool of `workers` processes,
+    keeping at most `window` pages (default: `workers`) in flight.
+
+    With orientation="document" the rotation is detected on the first page only and
+    applied to every page; with "page" each page is checked on its own. With
+    lang_detect each page is OCR'd with the narrowest language set for its script,
+    judged from a low-resolution probe.
+    """
+    angle = None
+    if orientation == "document":
+        first = next(images, None)
+        if first is None:
+            return
+        angle = detect_orientation(binarize(first[1]), tesseract_lang, backend)
+        logging.info(f"Document orientation: {angle}°")
+        images = chain([first], images)
+        del first
 
-    txt_path = filepath + ".ocr.txt"
+    def finish(number: int, result: tuple[str, str]) -> tuple[int, str]:
+        text, lang = result
+        if lang_detect:
+            logging.info(f"Page {number}: OCR language {lang}")
+        return number, text
+
+    window = min(window or workers, workers)
+    if window <= 1:
+        for number, img in images:
+            yield finish(number, recognize_page(img, tesseract_lang, angle, preprocessing, backend,
+                                                lang_detect))
+        return
+    pool = get_pool(workers)
+    pending = deque()
     try:
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write(ocr_text)
+        for number, img in images:
+            future = pool.submit(recognize_page, img, tesseract_lang, angle, preprocessing, backend,
+                                 lang_detect)
+            pending.append((number, future))
+            del img
+            if len(pending) >= window:
+                number, future = pending.popleft()
+                yield finish(number, future.result())
+        while pending:
+            number, future = pending.popleft()
+            yield finish(number, future.result())
+    except BrokenProcessPool:
+        # A crashed worker breaks the whole pool; start a fresh one for the next document.
+        shutdown_pool()
+        raise
+    finally:
+        # The consumer may stop early (see LazyText); drop pages that have not started.
+        for _, future in pending:
+            future.cancel()
+
+OCR_DEFAULTS = {
+    "workers": 1,
+    "dpi": 300,
+    "min_text_chars": MIN_TEXT_LAYER_CHARS,
+    "rasterizer": "pymupdf",
+    "orientation": "page",
+    "preprocessing": "legacy",
+    "backend": "pytesseract",
+    "lang_detect": False,
+}
+
+class LazyText:
+    """Document text that is extracted page by page, only as far as it is read.
+
+    prefix(n) returns the leading pages that hold at least n non-blank characters,
+    pulling pages only as needed; full() extracts the rest. on_complete receives the whole text once the
+    last page has been read.
+    """
+
+    def __init__(self, pages: Iterator[str], on_complete: Optional[Callable[[str], None]] = None,
+                 on_close: Optional[Callable[[list[str]], None]] = None):
+        self._pages = pages
+        self._parts = []
+        self._chars = 0
+        self._on_complete = on_complete
+        self._on_close = on_close
+        self.exhausted = False
+
+    def _pull(self) -> bool:
+        if self.exhausted:
+            return False
+        page = next(self._pages, None)
+        if page is None:
+            self.exhausted = True
+            if self._on_complete:
+                self._on_complete(self.text)
+            return False
+        self._parts.append(page)
+        self._chars += len(page.strip())
+        return True
+
+    @property
+    def text(self) -> str:
+        """Text of the pages read so far."""
+        return "".join(self._parts)
+
+    @property
+    def pages_read(self) -> int:
+        return len(self._parts)
+
+    def prefix(self, chars: int) -> str:
+        """Text of the leading pages holding at least `chars` non-blank characters (or the whole document).
+
+        Reads more pages only if needed; the result is the same whether or not the rest was read already.
+        """
+        while self._chars < chars and self._pull():
+            pass
+        parts, taken = [], 0
+        for page in self._parts:
+            if taken >= chars:
+                break
+            parts.append(page)
+            taken += len(page.strip())
+        return "".join(parts)
+
+    def full(self) -> str:
+        """Read all remaining pages and return the whole document text."""
+        while self._pull():
+            pass
+        return self.text
+
+    def close(self) -> None:
+        """Stop extraction early and release the document and OCR workers.
+
+        on_close receives the pages read so far if the document was not read to the end.
+        """
+        if self._on_close and not self.exhausted and self._parts:
+            self._on_close(list(self._parts))
+        close = getattr(self._pages, "close", None)
+        if close:
+            close()
+
+    def __str__(self) -> str:
+        return self.full()
+
+def extract_text(filepath: str, tesseract_lang: str, workers: int = 1, dpi: int = 300,
+                 cache: Optional[TextCache] = None, min_text_chars: int = MIN_TEXT_LAYER_CHARS,
+                 rasterizer: str = "pymupdf", orientation: str = "page", preprocessing: str = "legacy",
+                 backend: str = "pytesseract", lang_detect: bool = False) -> str:
+    """Extract text from a PDF file, page by page, using PyMuPDF or OCR as fallback.
+
+    Pages with a usable text layer (at least min_text_chars characters) are taken
+    from PyMuPDF; only image pages without one are OCR'd. Pages are rasterized lazily,
+    one at a time, either from the already open PyMuPDF document ("pymupdf") or via
+    poppler ("pdf2image"). With workers > 1 they are OCR'd in a process pool (at most
+    `workers` pages in flight) and joined back in page order, so the result is identical
+    to the sequential run. Orientation is detected per page ("page") or once on the
+    first OCR'd page and reused ("document"). Page images are cleaned up by the PIL
+    "legacy" pipeline or the NumPy "numpy" one (adaptive binarization, deskew) and
+    recognized by the given OCR backend ("pytesseract" or the in-process "tesserocr").
+    With lang_detect, each OCR'd page uses only "rus" or "eng" when its script is
+    clearly one of them, and the combined tesseract_lang otherwise.
+    When a cache is given, results are looked up by file content and extraction
+    settings first.
+    """
+    return open_text(
+        filepath, tesseract_lang, cache=cache, workers=workers, dpi=dpi, min_text_chars=min_text_chars,
+        rasterizer=rasterizer, orientation=orientation, preprocessing=preprocessing, backend=backend,
+        lang_detect=lang_detect,
+    ).full()
+
+def open_text(filepath: str, tesseract_lang: str, cache: Optional[TextCache] = None, **settings) -> LazyText:
+    """Open a document for incremental extraction with the same settings as extract_text.
+
+    Nothing is extracted until the returned LazyText is read, and only as many
+    pages as the reader asks for. Fully read documents are stored in the cache;
+    the leading pages of a document closed early are stored as a separate prefix
+    entry, so repeated classification of the same file skips the OCR. Reading past
+    a cached prefix extracts the document again from the start.
+    """
+    name = os.path.basename(filepath)
+    if cache is None:
+        return LazyText(iter_text(filepath, tesseract_lang, **settings))
+    merged = {**OCR_DEFAULTS, **settings}
+    try:
+        key = cache.key(filepath, tesseract_lang, *(f"{k}={merged[k]}" for k in sorted(merged) if k != "workers"),
+                        PREPROCESS_VERSION)
+    except OSError as e:
+        logging.error(f"Text cache key failed for {name}: {e}")
+        return LazyText(iter_text(filepath, tesseract_lang, **settings))
+    txt = cache.get(key)
+    if txt is not None:
+        logging.info(f"Text cache hit: {name}")
+        return LazyText(iter([txt]))
+    prefix_key = f"{key}.prefix"
+    try:
+        cached = json.loads(cache.get(prefix_key) or "[]")
+    except ValueError:
+        cached = []
+    if cached:
+        logging.info(f"Text cache hit: {name} (first {len(cached)} pages)")
+
+    def pages() -> Iterator[str]:
+        yield from cached
+        rest = iter_text(filepath, tesseract_lang, **settings)
+        try:
+            for number, page in enumerate(rest):
+                if number >= len(cached):
+                    yield page
+        finally:
+            close = getattr(rest, "close", None)
+            if close:
+                close()
+
+    def store(txt: str) -> None:
+        if txt.strip():
+            cache.put(key, txt)
+
+    def store_prefix(parts: list[str]) -> None:
+        if len(parts) > len(cached) and "".join(parts).strip():
+            cache.put(prefix_key, json.dumps(parts, ensure_ascii=False))
+
+    return LazyText(pages(), on_complete=store, on_close=store_prefix)
+
+def _needs_ocr(page: "fitz.Page", text: str, min_text_chars: int) -> bool:
+    """A page needs OCR when its text layer is (almost) empty but it carries images."""
+    return len(text.strip()) < min_text_chars and bool(page.get_images())
+
+def _merge_pages(pages: list[Optional[str]], ocr_results: Iterator[tuple[int, str]]) -> Iterator[str]:
+    """Yield page texts in order; None slots are filled from ocr_results as they complete.
+
+    ocr_results come in page order but may skip pages that failed to rasterize;
+    those pages stay empty.
+    """
+    chars = 0
+    pending = None
+    for number, page in enumerate(pages, start=1):
+        if page is None:
+            page = ""
+            if pending is None:
+                pending = next(ocr_results, None)
+            if pending is not None and pending[0] == number:
+                page = pending[1]
+                pending = None
+        chars += len(page) + 1
+        yield page + "\n"
+    logging.info(f"OCR done ({chars} chars)")
+
+def iter_text(filepath: str, tesseract_lang: str, workers: int = 1, dpi: int = 300,
+              min_text_chars: int = MIN_TEXT_LAYER_CHARS, rasterizer: str = "pymupdf", orientation: str = "page",
+              preprocessing: str = "legacy", backend: str = "pytesseract",
+              lang_detect: bool = False) -> Iterator[str]:
+    """Yield the text of each page (with its trailing newline) in page order; see extract_text."""
+    name = os.path.basename(filepath)
+    try:
+        doc = fitz.open(filepath)
     except Exception as e:
-        logging.error(f"Saving OCR text failed: {e}")
+        logging.error(f"PyMuPDF error for {name}: {e}")
+        try:
+            page_count = pdfinfo_from_path(filepath)["Pages"]
+        except Exception as e:
+            logging.error(f"PDF→image conversion error: {e}")
+            return
+        logging.info(f"OCR fallback for {name}: {page_count} pages")
+        numbers = list(range(1, page_count + 1))
+        # The pool is sized by the configuration alone, so it is reused whatever the page count
+        workers = resolve_workers(workers)
+        images = iter_page_images(filepath, numbers, dpi=dpi)
+        ocr_results = _ocr_pages(images, tesseract_lang, workers, orientation, preprocessing, backend, lang_detect,
+                                 window=page_count)
+        yield from _merge_pages([None] * page_count, ocr_results)
+        return
+
+    with doc:
+        pages = [page.get_text() for page in doc]
+        ocr_numbers = [i + 1 for i, page in enumerate(doc) if _needs_ocr(page, pages[i], min_text_chars)]
+        if not ocr_numbers:
+            logging.info(f"Text extracted by PyMuPDF: {name}")
+            for page in pages:
+                yield page + "\n"
+            return
 
-    logging.info(f"OCR done ({len(ocr_text)} chars)")
-    return ocr_text
+        logging.info(f"OCR fallback for {name}: {len(ocr_numbers)} of {len(pages)} pages")
+        workers = resolve_workers(workers)
+        if min(workers, len(ocr_numbers)) > 1:
+            logging.info(f"OCR of {len(ocr_numbers)} pages with {min(workers, len(ocr_numbers))} workers")
+        if rasterizer == "pdf2image":
+            images = iter_page_images(filepath, ocr_numbers, dpi=dpi)
+        else:
+            images = iter_pixmap_images(doc, ocr_numbers, dpi=dpi)
+        for number in ocr_numbers:
+            pages[number - 1] = None
+        ocr_results = _ocr_pages(images, tesseract_lang, workers, orientation, preprocessing, backend,
+                                 lang_detect, window=len(ocr_numbers))
+        yield from _merge_pages(pages, ocr_results)
@@ -0,0 +1,51 @@
+import logging
+import time
+from typing import Callable, NamedTuple, Optional, Sequence
+
+SKIPPED_DESCRIPTION = "Не классифицирован: ФИО не совпадает"
+
+class Stage(NamedTuple):
+    """One step of document processing."""
+    name: str
+    cost: float                                     # estimated seconds per document; cheaper stages run first
+    run: Callable[[list[dict]], None]               # processes the documents that reach it, in place
+    skip: Optional[Callable[[dict], bool]] = None   # short-circuit rule: True keeps a document out of this stage
+
+def name_mismatch(doc: dict) -> bool:
+    """Short-circuit rule: the applicant's name was not found in the document."""
+    return not doc.get("fio_match", False)
+
+class Pipeline:
+    """
+    Runs stages over a batch of documents in order of declared cost, so cheap checks can
+    keep documents out of expensive stages. Each stage gets all documents that reached it
+    at once (e.g. to batch LLM requests); skipped stage names are listed in doc["skipped"].
+    """
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = sorted(stages, key=lambda s: s.cost)
+        self.processed = {s.name: 0 for s in self.stages}
+        self.skipped = {s.name: 0 for s in self.stages}
+        self.seconds = {s.name: 0.0 for s in self.stages}
+
+    def run(self, docs: list[dict]) -> list[dict]:
+        for stage in self.stages:
+            active = []
+            for doc in docs:
+                if stage.skip and stage.skip(doc):
+                    doc.setdefault("skipped", []).append(stage.name)
+                else:
+                    active.append(doc)
+            self.processed[stage.name] += len(active)
+            self.skipped[stage.name] += len(docs) - len(active)
+            logging.info(f"Stage '{stage.name}': {len(active)} of {len(docs)} documents")
+            if active:
+                t0 = time.perf_counter()
+                stage.run(active)
+                self.seconds[stage.name] += time.perf_counter() - t0
+        return docs
+
+    def stats(self) -> str:
+        return "Pipeline: " + "; ".join(
+            f"{s.name} {self.processed[s.name]} run, {self.skipped[s.name]} skipped, {self.seconds[s.name]:.2f}s"
+            for s in self.stages
+        )
@@ -0,0 +1,126 @@
+import logging
+from functools import partial
+from typing import Optional
+
+from src.processors.classifier import CategorySimilarityIndex, is_match
+from src.processors.llm_client import classify_batch_with_llm, classify_with_llm, PROMPT_TEXT_CHARS
+from src.processors.name_extractor import extract_person_name
+from src.processors.pipeline import Pipeline, Stage, SKIPPED_DESCRIPTION, name_mismatch
+from src.processors.scheduler import run_bounded
+from src.processors.text_compressor import compress_text
+
+NAME_CHECK_COST = 0.001      # seconds per document, for stage ordering
+CLASSIFICATION_COST = 5.0
+
+def compress_prompt(text: str, token_budget: Optional[int] = None) -> str:
+    """OCR text as sent to the model: compressed to token_budget tokens if it is set."""
+    if not token_budget:
+        return text
+    return compress_text(text, int(token_budget), PROMPT_TEXT_CHARS) or text
+
+class PortfolioStages:
+    """
+    Name check and classification of portfolio documents, shared by src.main and `portfolio`.
+    Documents are dicts with "filename", "claimed", "head" (first pages) and "text" (whole document);
+    the name check adds "person" and "fio_match", classification adds "detected", "description",
+    "similarity" and "match". Settings come from llm_config.json: batch_size, concurrency,
+    prompt_token_budget and skip_llm_on_name_mismatch.
+    """
+    def __init__(self, categories: list[str], model: str, output_dir: str, llm_cfg: dict,
+                 client=None, cache=None, classify=classify_with_llm, router=None, cascade=None,
+                 similarity: Optional[CategorySimilarityIndex] = None):
+        self.categories = categories
+        self.model = model
+        self.output_dir = output_dir
+        self.client = client
+        self.cache = cache
+        self.classify = classify
+        self.router = router
+        self.cascade = cascade
+        self.similarity = similarity or CategorySimilarityIndex(categories)
+        self.batch_size = max(1, int(llm_cfg.get("batch_size", 1)))
+        self.concurrency = llm_cfg.get("concurrency", 1)
+        self.token_budget = llm_cfg.get("prompt_token_budget")
+        self.skip_on_name_mismatch = llm_cfg.get("skip_llm_on_name_mismatch", False)
+
+    def check_names(self, docs: list[dict], expected_name: str) -> None:
+        """Pipeline stage: look for the applicant's name in the whole text of each document."""
+        for doc in docs:
+            logging.info(f"Extracting person name from: {doc['filename']}")
+            person = extract_person_name(doc["text"], expected_name, self.model, self.output_dir)
+            doc["person"] = person
+            doc["fio_match"] = person.get("match_with_expected", False)
+            logging.info(f"Extracted name: {person.get('full_name', 'Not found')}")
+            logging.info(f"Name matches expected: {'YES' if doc['fio_match'] else 'NO'}")
+            if person.get("comment"):
+                logging.info(f"Name extraction comment: {person['comment']}")
+
+    def classify_documents(self, docs: list[dict]) -> None:
+        """
+        Pipeline stage: classify the first pages of each document and compare with the claimed type.
+        Obvious documents are decided by keywords (if enabled), the rest are grouped by batch_size
+        into one prompt; requests run in parallel, at most `concurrency` at a time.
+        """
+        # The keyword pre-classifier sees the same (compressed) text as the LLM prompts it stands in for
+        heads = [compress_prompt(doc["head"], self.token_budget) for doc in docs]
+        decisions = [self.cascade.decide(head) if self.cascade else None for head in heads]
+        to_llm = [i for i, d in enumerate(decisions) if d is None or d.escalate]
+        logging.info(f"Running LLM classification for {len(to_llm)} of {len(docs)} documents")
+        if self.router:
+            # Routing is decided per document, against its claimed type
+            batches = [[i] for i in to_llm]
+            jobs = [
+                partial(self.router.classify_many, [heads[i] for i in batch], self.categories, self.model,
+                        self.output_dir, client=self.client, cache=self.cache,
+                        claimed=[docs[i]["claimed"] for i in batch])
+                for batch in batches
+            ]
+        else:
+            batches = [to_llm[i:i + self.batch_size] for i in range(0, len(to_llm), self.batch_size)]
+            jobs = [
+                partial(classify_batch_with_llm, [heads[i] for i in batch], self.categories, self.model,
+                        self.output_dir, client=self.client, cache=self.cache, single=self.classify)
+                for batch in batches
+            ]
+        answers = {}
+        for batch, job in zip(batches, run_bounded(jobs, self.concurrency)):
+            answers.update((i, (answer, job)) for i, answer in zip(batch, job.value))
+        for i, doc in enumerate(docs):
+            fname, claimed = doc["filename"], doc["claimed"]
+            if i in answers:
+                (detected, desc, llm_raw), job = answers[i]
+                if self.cascade:
+                    self.cascade.record(decisions[i], detected)
+                logging.info(f"LLM request for {fname}: queue wait {job.queue_wait:.2f}s, service {job.service_time:.2f}s")
+            else:
+                detected, desc, llm_raw = self.cascade.answer(decisions[i])
+                logging.info(f"Classified {fname} by keywords (score {decisions[i].score:.2f})")
+            logging.debug("[LLM RAW OUTPUT] ------------------------------")
+            logging.debug(llm_raw)
+            logging.debug("[END LLM RAW OUTPUT] --------------------------")
+            logging.info(f"LLM detected category: {detected}")
+            logging.info(f"LLM description: {desc}")
+            sim = self.similarity.similarity(detected, claimed)
+            match = is_match(detected, claimed, similarity=sim)
+            logging.info(f"Similarity score: {sim:.3f}")
+            logging.info(f"Category match: {'YES' if match else 'NO'}")
+            doc.update(detected=detected, description=desc, similarity=sim, match=match)
+
+    def run(self, docs: list[dict], expected_name: str) -> Pipeline:
+        """
+        Run the stages from cheap to expensive: the name check (fractions of a millisecond) comes
+        before model classification (seconds), and documents with someone else's name are kept out
+        of the LLM if skip_llm_on_name_mismatch is set. Skipped documents get SKIPPED_DESCRIPTION.
+        Returns the pipeline for its stats.
+        """
+        pipeline = Pipeline([
+            Stage("name check", NAME_CHECK_COST, partial(self.check_names, expected_name=expected_name)),
+            Stage("classification", CLASSIFICATION_COST, self.classify_documents,
+                  skip=name_mismatch if self.skip_on_name_mismatch else None),
+        ])
+        pipeline.run(docs)
+        for doc in docs:
+            if "classification" in doc.get("skipped", ()):
+                logging.info(f"Skipping classification for {doc['filename']} (FIO mismatch)")
+                doc.update(detected="", description=SKIPPED_DESCRIPTION, similarity=0.0, match=False)
+        return pipeline
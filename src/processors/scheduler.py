@@ -0,0 +1,42 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, NamedTuple, Sequence
+
+class JobResult(NamedTuple):
+    """Result of one scheduled call with its timings in seconds."""
+    value: Any
+    queue_wait: float
+    service_time: float
+
+async def _run_bounded(jobs: Sequence[Callable[[], Any]], concurrency: int) -> list[JobResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def run(job: Callable[[], Any]) -> JobResult:
+        submitted = loop.time()
+        async with semaphore:
+            started = loop.time()
+            value = await asyncio.to_thread(job)
+            return JobResult(value, started - submitted, loop.time() - started)
+
+    return await asyncio.gather(*(run(job) for job in jobs))
+
+def run_bounded(jobs: Sequence[Callable[[], Any]], concurrency: int = 1) -> list[JobResult]:
+    """
+    Run blocking calls (e.g. LLM requests) with at most `concurrency` of them in flight.
+    Results come back in the order of `jobs`, each with the time it waited for a free slot
+    and the time the call itself took.
+    """
+    concurrency = max(1, int(concurrency))
+    if not jobs:
+        return []
+    t0 = time.perf_counter()
+    results = asyncio.run(_run_bounded(jobs, concurrency))
+    wall = time.perf_counter() - t0
+    busy = sum(r.service_time for r in results)
+    logging.info(
+        f"Scheduled {len(results)} requests with concurrency {concurrency}: "
+        f"{wall:.2f}s wall, {busy:.2f}s total service time"
+    )
+    return results
@@ -0,0 +1,88 @@
+import math
+import re
+
+# Words that mark the lines saying what a document is, who issued it and to whom.
+KEY_TERMS = (
+    "диплом", "приложени", "сертификат", "certificate", "удостоверени", "свидетельств", "справк",
+    "грамот", "награжд", "победител", "призер", "призёр", "участ", "конференц", "олимпиад",
+    "конкурс", "квалификац", "степен", "бакалавр", "магистр", "специалист", "отличием",
+    "университет", "university", "институт", "академи", "выдан", "настоящ", "подтвержда",
+    "ielts", "toefl", "cambridge", "test report", "патент", "программ", "статья", "журнал",
+    "journal", "тезис", "переподготовк", "повышени", "внедрени", "стаж", "award", "winner",
+)
+
+_SCRIPT_WORD = re.compile(r"^(?:[А-Яа-яЁё]+(?:-[А-Яа-яЁё]+)*|[A-Za-z]+(?:-[A-Za-z]+)*)$")
+_VOWELS = set("аеёиоуыэюяaeiouy")
+_FULL_NAME = re.compile(r"\b[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+(?:вич|вна|ична|ич)\b")
+_NOISE_TOKEN = re.compile(r"^[^\w«»\"“”№]+$")
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count: about one token per four characters of a word, one per punctuation mark."""
+    return sum(math.ceil(len(w) / 4) for w in re.findall(r"\w+", text)) + len(re.findall(r"[^\w\s]", text))
+
+def _is_word(token: str) -> bool:
+    token = token.strip(".,:;!?()«»\"“”'")
+    return len(token) >= 3 and bool(_SCRIPT_WORD.match(token)) and any(c in _VOWELS for c in token.lower())
+
+def clean_line(line: str) -> str:
+    """Drop table pipes, stray symbols and repeated whitespace."""
+    tokens = [t for t in line.replace("|", " ").split() if not _NOISE_TOKEN.match(t)]
+    return " ".join(tokens)
+
+def keep_words(line: str) -> str:
+    """Keep only plausible words and tokens with digits (numbers, dates), dropping OCR debris between them."""
+    return " ".join(t for t in line.split() if _is_word(t) or any(c.isdigit() for c in t))
+
+def line_quality(line: str) -> float:
+    """Share of the line's characters that belong to plausible words (0 for OCR garbage)."""
+    tokens = line.split()
+    total = sum(len(t) for t in tokens)
+    good = sum(len(t) for t in tokens if _is_word(t) and len(t.strip(".,:;!?()«»\"“”'")) >= 4)
+    return good / total if total else 0.0
+
+def _score(line: str, position: float, quality: float) -> float:
+    lower = line.lower()
+    score = quality + (1.0 - position)
+    score += 3.0 * min(2, sum(term in lower for term in KEY_TERMS))
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 8 and sum(c.isupper() for c in letters) / len(letters) > 0.7:
+        score += 2.0  # headings are usually set in capitals
+    if _FULL_NAME.search(line):
+        score += 2.0
+    if re.search(r"\d{2}[./]\d{2}[./]\d{2,4}|\b(19|20)\d{2}\b", line):
+        score += 0.5
+    return score
+
+def compress_text(text: str, token_budget: int = 500, max_chars: int = 2000,
+                  min_quality: float = 0.5) -> str:
+    """
+    Shrink OCR text for a prompt while keeping what identifies the document.
+    - Normalizes whitespace and strips table pipes and stray symbols.
+    - Drops lines that are mostly OCR garbage and repeated lines (page headers),
+      and the debris tokens left inside the remaining lines.
+    - Keeps the most informative lines (document type, issuer, holder, dates) within
+      the token budget and max_chars, in their original order.
+    """
+    lines, seen = [], set()
+    raw = [l for l in text.splitlines() if l.strip()]
+    for i, raw_line in enumerate(raw):
+        line = clean_line(raw_line)
+        key = re.sub(r"\W+", " ", line.lower()).strip()
+        if not key or key in seen:
+            continue
+        quality = line_quality(line)
+        if quality < min_quality:
+            continue
+        seen.add(key)
+        line = keep_words(line)
+        lines.append((i, line, _score(line, i / len(raw), quality)))
+
+    chosen, tokens, chars = [], 0, 0
+    for i, line, _ in sorted(lines, key=lambda l: -l[2]):
+        cost = estimate_tokens(line)
+        if tokens + cost > token_budget or chars + len(line) + 1 > max_chars:
+            continue
+        chosen.append((i, line))
+        tokens += cost
+        chars += len(line) + 1
+    return "\n".join(line for _, line in sorted(chosen))
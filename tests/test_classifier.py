@@ -1,4 +1,8 @@
-from src.processors.classifier import compute_similarity, is_match
+import difflib
+
+from src.processors.classifier import (
+    CategorySimilarityIndex, ClaimedTypeResolver, compute_similarity, is_match, normalize_text, sequence_match
+)
 
 def test_compute_similarity_identical():
     a = "Документ об образовании"
@@ -56,3 +60,61 @@ def test_is_match_empty_strings():
     assert is_match("", "") is True
     assert is_match("Диплом", "") is False
     assert is_match("", "Диплом") is False
+
+CATEGORIES = [
+    "1.1 диплом с отличием по направлению «Информатика и вычислительная техника»",
+    "1.2 диплом со средним баллом от 4,75 до 5",
+    "2.1 статья в периодическом издании, относящемся к квартилям Q1 и Q2",
+    "Иное",
+]
+CLAIMS = ["Диплом бакалавра", "диплом с отличием", "Статья Q1", "Сертификат", ""]
+
+def test_similarity_index_matches_compute_similarity():
+    index = CategorySimilarityIndex(CATEGORIES)
+    matrix = index.score_matrix(CLAIMS)
+    for i, category in enumerate(CATEGORIES):
+        for j, claimed in enumerate(CLAIMS):
+            assert abs(matrix[i, j] - compute_similarity(category, claimed)) < 1e-9
+    pairs = index.pairwise(CLAIMS, CLAIMS[::-1])
+    for (a, b), sim in zip(zip(CLAIMS, CLAIMS[::-1]), pairs):
+        assert abs(sim - compute_similarity(a, b)) < 1e-9
+
+def test_similarity_index_best_and_score_all():
+    index = CategorySimilarityIndex(CATEGORIES)
+    assert index.score_all("Статья Q1").shape == (len(CATEGORIES),)
+    assert index.best("диплом со средним баллом 4,8")[0] == CATEGORIES[1]
+    assert index.similarity("Иное", "Иное") == 1.0
+
+def test_similarity_index_save_load(tmp_path):
+    path = str(tmp_path / "index.joblib")
+    CategorySimilarityIndex(CATEGORIES).save(path)
+    index = CategorySimilarityIndex.load(path)
+    assert index.categories == CATEGORIES
+    assert index.best("статья в издании Q2")[0] == CATEGORIES[2]
+
+def test_is_match_uses_precomputed_similarity():
+    assert is_match("Диплом", "Аттестат", similarity=0.9) is True
+    assert is_match("Диплом", "Диплом", similarity=0.0) is True  # sequence fallback still applies
+
+def test_sequence_match_keeps_difflib_decisions():
+    strings = CATEGORIES + CLAIMS
+    for a in strings:
+        for b in strings:
+            a_norm, b_norm = normalize_text(a), normalize_text(b)
+            ratio = difflib.SequenceMatcher(None, a_norm, b_norm).ratio()
+            for threshold in (0.3, 0.5, 0.7, 0.9):
+                assert sequence_match(a_norm, b_norm, threshold) == (ratio >= threshold)
+
+def test_claimed_type_resolver_top_k():
+    resolver = ClaimedTypeResolver(CATEGORIES)
+    top = resolver.top_k("диплом с отличием", k=2)
+    assert [category for category, _ in top] == [CATEGORIES[0], CATEGORIES[1]]
+    assert top[0][1] > top[1][1]
+    assert resolver.top_k("zzzz") == []
+
+def test_claimed_type_resolver_respects_is_match():
+    resolver = ClaimedTypeResolver(CATEGORIES)
+    assert resolver.resolve("иное") == "Иное"
+    assert resolver.resolve("диплом со средним баллом от 4,75 до 5") == CATEGORIES[1]
+    assert resolver.resolve("Сертификат") is None
+    assert resolver.resolve("") is None
@@ -280,6 +280,27 @@ def test_full_pipeline_build_manifest_and_portfolio():
     finally:
         os.unlink(manifest_path)
 
+def test_cli_find_applicant_command(capsys):
+    """Test find-applicant command against several applicants' names"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        applicants_path = os.path.join(tmp_dir, "applicants.json")
+        manifest_path = os.path.join(tmp_dir, "manifest.json")
+        with open(applicants_path, "w", encoding="utf-8") as f:
+            json.dump(["Иванов Иван Иванович", {"expected_name": "Петров Петр Петрович"}], f, ensure_ascii=False)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump([{"expected_name": "Сидорова Анна"}, {"filename": "1.pdf", "claimed_type": "Диплом"}], f, ensure_ascii=False)
+        texts = {"a.pdf": "Диплом выдан Петров П. П.", "b.pdf": "Анна Сидорова, Иванов Иван Иванович", "c.pdf": "Справка"}
+        with patch('src.cli.extract_text', side_effect=lambda path, *a, **k: texts[path]):
+            from src.cli import find_applicant_command
+            from argparse import Namespace
+            find_applicant_command(Namespace(document_paths=list(texts), applicants=[applicants_path, manifest_path]))
+    out = capsys.readouterr().out
+    assert "Indexed 3 applicants" in out
+    a, b, c = out.split("Document: ")[1:]
+    assert "Петров Петр Петрович: 1 occurrence(s) (петров п.п.)" in a
+    assert "Сидорова Анна" in b and "Иванов Иван Иванович" in b and "Петров" not in b
+    assert "No applicant found" in c
+
 def main():
     """Run all CLI functionality tests"""
     print("Testing CLI Functionality (Mocked)...")
@@ -0,0 +1,65 @@
+from src.processors.distilled_classifier import DistilledClassifier, parse_llm_log, train_classifier
+from src.core.logger import log_llm_call
+
+CATEGORIES = ["1.1 диплом с отличием", "4.10 Подтверждение уровня английского языка", "Иное"]
+
+def _prompt(text):
+    return (
+        "Ответь строго в формате:\nКатегория: <...>\nОписание: <...>\n\n"
+        f"Текст (первые 2000 знаков):\n{text}\n\nПример:\nКатегория: 1.1 диплом с отличием\n"
+    )
+
+def test_parse_llm_log_reads_responses_only(tmp_path):
+    log_llm_call("classify_with_llm", _prompt("диплом бакалавра с отличием"), "Категория: 1.1\nОписание: Диплом", "", str(tmp_path),
+                 {"ttft": 0.5, "tokens": 12})
+    log_llm_call("classify_with_llm (cache)", _prompt("кэш"), "Категория: Иное", "", str(tmp_path))
+    log_llm_call("classify_with_llm", _prompt("пусто"), "", "", str(tmp_path))
+    log_llm_call("classify_with_llm", _prompt("выдумка"), "Категория: Сертификат", "", str(tmp_path))
+    log_llm_call("extract_person_name", "Категория: Иное", "Категория: Иное", "", str(tmp_path))
+    batch_prompt = (
+        "Категории:\n- ...\n"
+        "\nДокумент 1. Текст (первые 1000 знаков):\nIELTS Test Report Form\n"
+        "\nДокумент 2. Текст (фрагмент до 1000 знаков):\nсправка\n"
+        '\nПример:\n[{"id": 1, "category": "1.1 диплом с отличием"}]\n'
+    )
+    log_llm_call("classify_batch_with_llm", batch_prompt,
+                 '[{"id": 1, "category": "4.10 Подтверждение уровня английского языка", "description": ""},'
+                 ' {"id": 2, "category": "Иное", "description": ""}]', "", str(tmp_path))
+    samples = parse_llm_log([str(tmp_path / "llm_raw.log"), str(tmp_path / "missing.log")], CATEGORIES)
+    assert samples == [
+        ("диплом бакалавра с отличием", "1.1 диплом с отличием"),
+        ("IELTS Test Report Form", "4.10 Подтверждение уровня английского языка"),
+        ("справка", "Иное"),
+    ]
+
+def test_train_save_and_predict(tmp_path):
+    samples = []
+    for i in range(8):
+        samples.append((f"Диплом бакалавра с отличием номер {i} Информатика", CATEGORIES[0]))
+        samples.append((f"IELTS Test Report Form Overall Band Score {i}", CATEGORIES[1]))
+    model, report = train_classifier(samples, test_size=0.25)
+    assert "Held-out agreement with LLM labels" in report
+    path = str(tmp_path / "models" / "clf.joblib")
+    DistilledClassifier(model).save(path)
+    category, prob, margin = DistilledClassifier.load(path).predict("IELTS Band Score 7.0")
+    assert category == CATEGORIES[1]
+    assert 0.5 < prob <= 1.0 and margin > 0
+
+def test_train_requires_two_categories():
+    try:
+        train_classifier([("текст", "Иное")])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+def test_make_cascade_uses_distilled_model(tmp_path):
+    from src.processors.lexical_classifier import make_cascade
+    samples = [(f"Диплом с отличием {i}", CATEGORIES[0]) for i in range(3)]
+    samples += [(f"IELTS Band Score {i}", CATEGORIES[1]) for i in range(3)]
+    path = str(tmp_path / "clf.joblib")
+    DistilledClassifier(train_classifier(samples, test_size=0)[0]).save(path)
+    cfg = {"pre_classifier": "distilled", "distilled_model": path, "distilled_threshold": 0.5, "distilled_margin": 0.0}
+    cascade = make_cascade(cfg, CATEGORIES, fallback=None)
+    assert cascade("IELTS Band Score", CATEGORIES, "m", ".")[:2] == (CATEGORIES[1], "Определено обученным классификатором")
+    assert make_cascade({**cfg, "distilled_model": str(tmp_path / "missing")}, CATEGORIES, None) is None
@@ -0,0 +1,52 @@
+from src.processors.lexical_classifier import LexicalClassifier, LexicalCascade, LEXICAL_DESCRIPTION, make_cascade
+
+CATEGORIES = [
+    "1.1 диплом с отличием",
+    "4.10 Подтверждение уровня английского языка",
+    "5.1 Патент на изобретение",
+    "Иное",
+]
+KEYWORDS = {"4.10 Подтверждение уровня английского языка": ["IELTS", "Test Report Form", "Overall Band Score"]}
+IELTS_TEXT = "IELTS Test Report Form ACADEMIC Candidate Details Overall Band Score 7.5 Listening Reading"
+
+def test_predicts_by_keywords():
+    clf = LexicalClassifier(CATEGORIES, KEYWORDS)
+    category, score, margin = clf.predict(IELTS_TEXT)
+    assert category == "4.10 Подтверждение уровня английского языка"
+    assert score > 0.3 and margin > 0.2
+    assert "Иное" not in dict(clf.scores(IELTS_TEXT))
+
+def _llm(answers):
+    calls = []
+    def classify(text, categories, model, output_dir, client=None, cache=None):
+        calls.append(text)
+        return answers.pop(0), "ответ модели", "raw"
+    return classify, calls
+
+def test_cascade_skips_llm_when_confident():
+    llm, calls = _llm([])
+    cascade = LexicalCascade(LexicalClassifier(CATEGORIES, KEYWORDS), threshold=0.3, margin=0.1, fallback=llm)
+    assert cascade(IELTS_TEXT, CATEGORIES, "m", ".") == (
+        "4.10 Подтверждение уровня английского языка", LEXICAL_DESCRIPTION, "")
+    assert calls == []
+    assert "1 of 1 decided locally, escalation rate 0%" in cascade.stats()
+
+def test_cascade_escalates_and_tracks_agreement():
+    llm, calls = _llm(["5.1 Патент на изобретение"])
+    cascade = LexicalCascade(LexicalClassifier(CATEGORIES, KEYWORDS), threshold=0.3, margin=0.1, fallback=llm)
+    result = cascade("Справка с места работы", CATEGORIES, "m", ".")
+    assert result[0] == "5.1 Патент на изобретение"
+    assert len(calls) == 1
+    assert "escalation rate 100%" in cascade.stats()
+    assert "agreement with LLM (escalated)" in cascade.stats()
+
+def test_cascade_audits_confident_decisions():
+    llm, calls = _llm(["4.10 Подтверждение уровня английского языка"])
+    cascade = LexicalCascade(LexicalClassifier(CATEGORIES, KEYWORDS), threshold=0.3, margin=0.1,
+                             audit_rate=1.0, fallback=llm)
+    assert cascade(IELTS_TEXT, CATEGORIES, "m", ".")[1] == "ответ модели"
+    assert cascade.compared["confident"] == [1, 1]
+
+def test_make_cascade_disabled_without_threshold():
+    assert make_cascade({}, CATEGORIES, None) is None
+    assert make_cascade({"lexical_threshold": 0.5, "lexical_keywords": ""}, CATEGORIES, None).threshold == 0.5
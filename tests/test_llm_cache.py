@@ -0,0 +1,38 @@
+import time
+from src.core.llm_cache import LLMCache
+
+def test_key_depends_on_model_prompt_and_options():
+    base = LLMCache.key("mistral", "промпт", {"temperature": 0})
+    assert base == LLMCache.key("mistral", "промпт", {"temperature": 0})
+    assert base != LLMCache.key("qwen", "промпт", {"temperature": 0})
+    assert base != LLMCache.key("mistral", "другой промпт", {"temperature": 0})
+    assert base != LLMCache.key("mistral", "промпт", {"temperature": 0.5})
+
+def test_get_put_roundtrip_and_counters(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    assert cache.get("mistral", "p") is None
+    cache.put("mistral", "p", "Категория: Диплом")
+    assert cache.get("mistral", "p") == "Категория: Диплом"
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+    reopened = LLMCache(str(tmp_path / "llm.sqlite"))
+    assert reopened.get("mistral", "p") == "Категория: Диплом"
+
+def test_expired_entries_miss(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"), ttl_seconds=60)
+    cache.put("mistral", "p", "ответ")
+    now = time.time()
+    monkeypatch.setattr("src.core.llm_cache.time.time", lambda: now + 120)
+    assert cache.get("mistral", "p") is None
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr("src.core.llm_cache.time.time", lambda: next(clock))
+    cache = LLMCache(str(tmp_path / "llm.sqlite"), max_entries=2)
+    cache.put("m", "a", "1")
+    cache.put("m", "b", "2")
+    assert cache.get("m", "a") == "1"  # "b" is now the least recently used
+    cache.put("m", "c", "3")
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == "1"
+    assert cache.get("m", "c") == "3"
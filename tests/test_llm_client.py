@@ -1,5 +1,17 @@
 import json
-from src.processors.llm_client import classify_with_llm
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.core.llm_cache import LLMCache
+from src.processors.llm_client import (
+    classify_with_llm, classify_batch_with_llm, classify_hierarchical_with_llm, classification_complete,
+    get_classifier_for_mode,
+    OllamaClient, ModelRouter, make_client, make_router, run_llm,
+)
 
 def test_classify_with_llm_structure(monkeypatch):
     # Подменяем вызов subprocess для теста
@@ -111,3 +123,336 @@ def test_classify_with_llm_text_truncation(monkeypatch):
     assert cat == "Диплом"
     assert desc == "Документ"
     assert "Категория" in raw
+
+
+class _FakeOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+    peers = set()
+    completed = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append(body)
+        type(self).peers.add(self.client_address)
+        if body["model"] == "missing":
+            status, reply = 404, {"error": "model 'missing' not found"}
+        elif body.get("stream"):
+            return self._stream(body)
+        else:
+            status, reply = 200, {"response": "Категория: Диплом\nОписание: Диплом бакалавра", "done": True,
+                              "prompt_eval_count": 10, "eval_count": 5}
+        data = json.dumps(reply, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Reasoning, the two answer lines, then rambling; "short" models stop right after the answer.
+    STREAM = ["<think>", "Категория: ?", "</think>", "Категория: Диплом", "\n", "Описание: Диплом", "\n"]
+
+    def _stream(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = self.STREAM if body["model"] == "short" else self.STREAM + ["бла "] * 200
+        chunks = [{"response": p, "done": False} for p in pieces]
+        chunks.append({"response": "", "done": True, "prompt_eval_count": 10, "eval_count": len(pieces)})
+        try:
+            for chunk in chunks:
+                line = json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+                time.sleep(0.001)
+            self.wfile.write(b"0\r\n\r\n")
+            type(self).completed.append(body["model"])
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ollama_server():
+    _FakeOllama.requests = []
+    _FakeOllama.peers = set()
+    _FakeOllama.completed = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllama)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_client_reuses_connection(ollama_server, monkeypatch, tmp_path):
+    def fail_run(*args, **kwargs):
+        raise AssertionError("ollama run must not be used when the HTTP API is up")
+    monkeypatch.setattr("subprocess.run", fail_run)
+    client = OllamaClient(ollama_server, keep_alive="5m", options={"temperature": 0})
+    for _ in range(3):
+        cat, desc, _ = classify_with_llm("текст", ["Диплом"], "mistral", str(tmp_path), client=client)
+        assert cat == "Диплом"
+    client.close()
+    assert (client.requests, client.prompt_tokens, client.completion_tokens) == (3, 30, 15)
+    assert len(_FakeOllama.requests) == 3
+    assert len(_FakeOllama.peers) == 1  # one TCP connection for all calls
+    assert _FakeOllama.requests[0]["keep_alive"] == "5m"
+    assert _FakeOllama.requests[0]["options"] == {"temperature": 0}
+    assert _FakeOllama.requests[0]["stream"] is False
+
+
+def test_http_client_missing_model_exits(ollama_server, tmp_path):
+    client = OllamaClient(ollama_server)
+    with pytest.raises(SystemExit):
+        classify_with_llm("текст", ["Диплом"], "missing", str(tmp_path), client=client)
+
+
+def test_http_client_falls_back_to_cli(monkeypatch, tmp_path):
+    def fake_run(*args, **kwargs):
+        class Result:
+            stdout = "Категория: Аттестат\nОписание: Аттестат".encode("utf-8")
+            stderr = b""
+        return Result()
+    monkeypatch.setattr("subprocess.run", fake_run)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()  # nothing listens on this port
+    client = OllamaClient(f"http://127.0.0.1:{port}", timeout=2)
+    cat, _, _ = classify_with_llm("текст", ["Аттестат"], "mistral", str(tmp_path), client=client)
+    assert cat == "Аттестат"
+
+
+def test_make_client_backend():
+    assert make_client({"backend": "cli"}) is None
+    assert make_client({}) is None
+    client = make_client({"backend": "http", "host": "http://example:1234", "keep_alive": "1m"})
+    assert (client.host, client.port, client.keep_alive) == ("example", 1234, "1m")
+
+
+def test_classify_with_llm_uses_cache(monkeypatch, tmp_path):
+    calls = []
+    def fake_run(*args, **kwargs):
+        calls.append(kwargs["input"])
+        class Result:
+            stdout = "Категория: Диплом\nОписание: Диплом бакалавра".encode("utf-8")
+            stderr = b""
+        return Result()
+    monkeypatch.setattr("subprocess.run", fake_run)
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    first = classify_with_llm("текст", ["Диплом"], "mistral", str(tmp_path), cache=cache)
+    second = classify_with_llm("текст", ["Диплом"], "mistral", str(tmp_path), cache=cache)
+    assert first == second
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    log = (tmp_path / "llm_raw.log").read_text(encoding="utf-8")
+    assert "=== classify_with_llm (cache) |" in log
+    classify_with_llm("текст", ["Диплом"], "other-model", str(tmp_path), cache=cache)
+    assert len(calls) == 2
+
+
+def test_cache_key_follows_request_options(monkeypatch, tmp_path):
+    calls = []
+    def fake_generate(self, model, prompt, stop=None, max_tokens=None, meta=None):
+        calls.append(self._payload(model, prompt, max_tokens))
+        return "Категория: Диплом", ""
+    monkeypatch.setattr(OllamaClient, "generate", fake_generate)
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    client = OllamaClient("http://127.0.0.1:1", max_tokens=64)
+    run_llm("текст", "mistral", client, cache)
+    assert run_llm("текст", "mistral", client, cache)[2]
+    assert not run_llm("текст", "mistral", client, cache, max_tokens=8)[2]
+    client.stream = True
+    assert not run_llm("текст", "mistral", client, cache)[2]
+    assert [c["options"]["num_predict"] for c in calls] == [64, 8, 64]
+
+
+def _fake_llm(monkeypatch, answers):
+    prompts = []
+    def fake_run(*args, **kwargs):
+        prompts.append(kwargs["input"].decode("utf-8"))
+        class Result:
+            stdout = answers[len(prompts) - 1].encode("utf-8")
+            stderr = b""
+        return Result()
+    monkeypatch.setattr("subprocess.run", fake_run)
+    return prompts
+
+
+def test_classify_batch_with_llm_parses_json(monkeypatch, tmp_path):
+    answer = ('Вот ответ:\n[{"id": 2, "category": "Аттестат", "description": "Аттестат"},'
+              ' {"id": 1, "category": "Диплом", "description": "Диплом бакалавра"}]')
+    prompts = _fake_llm(monkeypatch, [answer])
+    results = classify_batch_with_llm(["текст 1", "текст 2"], ["Диплом", "Аттестат"], "m", str(tmp_path))
+    assert [r[:2] for r in results] == [("Диплом", "Диплом бакалавра"), ("Аттестат", "Аттестат")]
+    assert len(prompts) == 1
+    assert prompts[0].count("- Диплом") == 1  # categories are sent once per batch
+    assert "Документ 2." in prompts[0]
+
+
+def test_classify_batch_with_llm_falls_back_per_item(monkeypatch, tmp_path):
+    answer = '[{"id": 1, "category": "Диплом", "description": ""}, {"id": 2, "category": ""}, {"id": 7}]'
+    prompts = _fake_llm(monkeypatch, [answer, "Категория: Аттестат\nОписание: Аттестат"])
+    results = classify_batch_with_llm(["текст 1", "текст 2"], ["Диплом", "Аттестат"], "m", str(tmp_path))
+    assert [r[0] for r in results] == ["Диплом", "Аттестат"]
+    assert len(prompts) == 2
+    assert "текст 2" in prompts[1] and "текст 1" not in prompts[1]
+
+
+def test_classify_batch_with_llm_rechecks_unknown_categories(monkeypatch, tmp_path):
+    answer = ('[{"id": 1, "category": "диплом", "description": "Диплом"},'
+              ' {"id": 2, "category": "Справка об обучении", "description": "Справка"}]')
+    prompts = _fake_llm(monkeypatch, [answer, "Категория: Аттестат\nОписание: Аттестат"])
+    results = classify_batch_with_llm(["текст 1", "текст 2"], ["Диплом", "Аттестат"], "m", str(tmp_path))
+    assert [r[0] for r in results] == ["Диплом", "Аттестат"]
+    assert len(prompts) == 2
+    assert "текст 2" in prompts[1] and "текст 1" not in prompts[1]
+
+
+def test_classify_batch_with_llm_maps_categories_by_number(monkeypatch, tmp_path):
+    categories = ["1.1 диплом с отличием по направлению «Информатика»", "4.10 Подтверждение уровня английского языка"]
+    answer = ('[{"id": 1, "category": "1.1 диплом с отличием", "description": "Диплом"},'
+              ' {"id": 2, "category": "4.10", "description": "IELTS"}]')
+    prompts = _fake_llm(monkeypatch, [answer])
+    results = classify_batch_with_llm(["текст 1", "текст 2"], categories, "m", str(tmp_path))
+    assert [r[0] for r in results] == categories
+    assert len(prompts) == 1
+    assert f'"category": "{categories[0]}"' in prompts[0].split("Пример:")[1]
+
+
+def test_classify_batch_with_llm_unparseable(monkeypatch, tmp_path):
+    prompts = _fake_llm(monkeypatch, ["не JSON", "Категория: Диплом", "Категория: Аттестат"])
+    results = classify_batch_with_llm(["текст 1", "текст 2"], ["Диплом", "Аттестат"], "m", str(tmp_path))
+    assert [r[0] for r in results] == ["Диплом", "Аттестат"]
+    assert len(prompts) == 3
+
+
+def test_classify_hierarchical_two_stages(monkeypatch, tmp_path):
+    categories = ["1.1 диплом с отличием", "1.2 диплом со средним баллом", "2.1 статья Q1", "Иное"]
+    prompts = _fake_llm(monkeypatch, ["Раздел: 1", "Категория: 1.1 диплом с отличием\nОписание: Диплом"])
+    cat, desc, _ = classify_hierarchical_with_llm("текст", categories, "m", str(tmp_path))
+    assert (cat, desc) == ("1.1 диплом с отличием", "Диплом")
+    assert "Научные публикации" in prompts[0] and "2.1 статья Q1" not in prompts[0]
+    assert "1.2 диплом со средним баллом" in prompts[1] and "2.1 статья Q1" not in prompts[1]
+
+
+def test_classify_hierarchical_other_and_fallback(monkeypatch, tmp_path):
+    categories = ["1.1 диплом с отличием", "2.1 статья Q1", "Иное"]
+    prompts = _fake_llm(monkeypatch, ["Раздел: 0"])
+    assert classify_hierarchical_with_llm("текст", categories, "m", str(tmp_path))[0] == "Иное"
+    assert len(prompts) == 1
+    prompts = _fake_llm(monkeypatch, ["не знаю", "Категория: 2.1 статья Q1"])
+    assert classify_hierarchical_with_llm("текст", categories, "m", str(tmp_path))[0] == "2.1 статья Q1"
+    assert "1.1 диплом с отличием" in prompts[1]  # flat prompt with all categories
+
+
+def test_classify_hierarchical_describes_sections_and_recovers(monkeypatch, tmp_path):
+    categories = ["4.10 Подтверждение уровня английского языка (IELTS, TOEFL)", "5.1 Патент на изобретение",
+                  "1.1 диплом с отличием", "Иное"]
+    prompts = _fake_llm(monkeypatch, ["Раздел: 1", "Категория: Иное", "Категория: 4.10 Подтверждение уровня английского языка (IELTS, TOEFL)"])
+    cat, _, _ = classify_hierarchical_with_llm("IELTS Test Report Form", categories, "m", str(tmp_path))
+    assert cat == categories[0]
+    assert "4. Олимпиады и конкурсы: Подтверждение уровня английского языка" in prompts[0]
+    assert "5. НИР и гранты: Патент на изобретение" in prompts[0]
+    assert len(prompts) == 3 and "5.1 Патент на изобретение" in prompts[2]  # misrouted: flat prompt
+
+
+def test_unknown_prompt_mode_falls_back_to_flat():
+    assert get_classifier_for_mode("hierarchical") is classify_hierarchical_with_llm
+    assert get_classifier_for_mode("nested") is classify_with_llm
+
+
+def test_streaming_stops_once_answer_is_complete(ollama_server, tmp_path):
+    client = OllamaClient(ollama_server, stream=True, max_tokens=64)
+    meta = {}
+    out, err = client.generate("mistral", "промпт", stop=classification_complete, meta=meta)
+    assert err == ""
+    assert out.endswith("Категория: Диплом\nОписание: Диплом\n")
+    assert "бла" not in out
+    assert meta["stopped_early"] is True
+    assert meta["tokens"] == 7 and meta["ttft"] <= meta["duration"]
+    assert _FakeOllama.requests[0]["options"]["num_predict"] == 64
+    assert _FakeOllama.completed == []  # the server did not get to finish the stream
+
+
+def test_streaming_classify_logs_meta(ollama_server, tmp_path):
+    client = OllamaClient(ollama_server, stream=True)
+    cat, desc, _ = classify_with_llm("текст", ["Диплом"], "short", str(tmp_path), client=client)
+    assert (cat, desc) == ("Диплом", "Диплом")  # the guess inside <think> is ignored
+    log = (tmp_path / "llm_raw.log").read_text(encoding="utf-8")
+    assert "META: ttft=" in log
+
+
+def test_streaming_to_the_end_reuses_connection(ollama_server):
+    client = OllamaClient(ollama_server, stream=True)
+    for _ in range(2):
+        meta = {}
+        out, _ = client.generate("short", "промпт", meta=meta)
+        assert "stopped_early" not in meta and meta["prompt_tokens"] == 10
+    assert _FakeOllama.completed == ["short", "short"]
+    assert len(_FakeOllama.peers) == 1
+    assert client.completion_tokens == 14
+
+
+def _routed(monkeypatch, answers):
+    calls = []
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd[-1])
+        class Result:
+            stdout = answers[cmd[-1]].encode("utf-8")
+            stderr = b""
+        return Result()
+    monkeypatch.setattr("subprocess.run", fake_run)
+    return calls
+
+
+def test_router_keeps_small_model_answer(monkeypatch, tmp_path):
+    calls = _routed(monkeypatch, {"small": "Категория: Диплом\nОписание: Диплом"})
+    router = ModelRouter("small")
+    result = router("текст", ["Диплом", "Иное"], "large", str(tmp_path), claimed="Диплом")
+    assert result[0] == "Диплом"
+    assert calls == ["small"]
+    assert "small: 1 calls" in router.stats() and "0 escalated" in router.stats()
+
+
+def test_router_escalates(monkeypatch, tmp_path):
+    calls = _routed(monkeypatch, {"small": "не знаю", "large": "Категория: Аттестат\nОписание: Аттестат"})
+    router = ModelRouter("small")
+    assert router("текст", ["Диплом", "Аттестат", "Иное"], "large", str(tmp_path))[0] == "Аттестат"
+    calls = _routed(monkeypatch, {"small": "Категория: Справка", "large": "Категория: Диплом"})
+    assert router("текст", ["Диплом", "Иное"], "large", str(tmp_path))[0] == "Диплом"
+    calls = _routed(monkeypatch, {"small": "Категория: Диплом", "large": "Категория: Аттестат"})
+    results = router.classify_many(["текст"], ["Диплом", "Аттестат"], "large", str(tmp_path),
+                                   claimed=["аттестат"])
+    assert results[0][0] == "Аттестат"
+    assert calls == ["small", "large"]
+    assert router.escalations == 3 and router.calls == {"small": 3, "large": 3}
+    # a claim that resolves to no category is not checked
+    calls = _routed(monkeypatch, {"small": "Категория: Диплом", "large": "Категория: Аттестат"})
+    assert router("текст", ["Диплом", "Аттестат"], "large", str(tmp_path), claimed="Грамота олимпиады")[0] == "Диплом"
+    assert calls == ["small"]
+
+
+def test_router_maps_answers_by_number_and_resolves_claims(monkeypatch, tmp_path):
+    categories = ["1.1 диплом с отличием по направлению «Информатика»", "4.10 Подтверждение уровня английского языка", "Иное"]
+    calls = _routed(monkeypatch, {"small": "Категория: 1.1 диплом с отличием\nОписание: Диплом"})
+    router = ModelRouter("small")
+    result = router("текст", categories, "large", str(tmp_path), claimed="Красный диплом")
+    assert result[0] == categories[0]
+    calls += router.classify_many(["текст"], categories, "large", str(tmp_path),
+                                  claimed=["диплом с отличием по направлению Информатика"])
+    assert calls[:2] == ["small", "small"] and router.escalations == 0
+    calls = _routed(monkeypatch, {"small": "Категория: 1.1", "large": "Категория: 4.10 IELTS"})
+    result = router("текст", categories, "large", str(tmp_path), claimed="Подтверждение уровня английского языка")
+    assert result[0] == categories[1]
+    assert calls == ["small", "large"]
+
+
+def test_make_router():
+    assert make_router({"small_model": None}) is None
+    router = make_router({"small_model": "deepseek-r1:1.5b", "route_on_mismatch": False})
+    assert router.small_model == "deepseek-r1:1.5b" and not router.escalate_on_mismatch
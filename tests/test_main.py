@@ -1,6 +1,7 @@
 import os
 import json
 import pytest
+import pandas as pd
 from src.main import main
 
 def test_main_runs(tmp_path, monkeypatch):
@@ -183,3 +184,41 @@ def test_main_with_empty_manifest(tmp_path, monkeypatch):
 
     assert not (output_dir / "details.xlsx").exists()
     assert not (output_dir / "summary.json").exists()
+
+class _FakeText:
+    def __init__(self, text):
+        self.text, self.pages_read = text, 1
+    def prefix(self, chars):
+        return self.text[:chars]
+    def full(self):
+        return self.text
+    def close(self):
+        pass
+
+def test_main_skips_llm_on_name_mismatch(tmp_path, monkeypatch):
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    texts = {"own.pdf": "Диплом выдан Иванову Ивану Ивановичу", "other.pdf": "Диплом выдан Петрову Петру Петровичу"}
+    for name in texts:
+        (input_dir / name).write_text("dummy content")
+    monkeypatch.setattr("src.main.INPUT_DIR", str(input_dir))
+    monkeypatch.setattr("src.main.OUTPUT_DIR", str(output_dir))
+    monkeypatch.setattr("src.main.MANIFEST", [{"expected_name": "Иванов Иван Иванович"}] +
+                        [{"filename": name, "claimed_type": "Диплом бакалавра"} for name in texts])
+    monkeypatch.setattr("src.main.open_text", lambda path, *a, **k: _FakeText(texts[os.path.basename(path)]))
+    monkeypatch.setattr("src.main.LEXICAL", None)
+    monkeypatch.setattr("src.main.ROUTER", None)
+    monkeypatch.setattr("src.main.LLM_CFG", {"skip_llm_on_name_mismatch": True})
+    classified = []
+    def fake_batch(texts, *a, **k):
+        classified.extend(texts)
+        return [("1.1 диплом с отличием", "Диплом", "") for _ in texts]
+    monkeypatch.setattr("src.processors.portfolio_stages.classify_batch_with_llm", fake_batch)
+
+    main()
+
+    assert classified == [texts["own.pdf"]]
+    details = pd.read_excel(output_dir / "details.xlsx")
+    assert list(details["Описание"]) == ["Диплом", "Не классифицирован: ФИО не совпадает"]
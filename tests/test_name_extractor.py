@@ -1,5 +1,7 @@
 import json
-from src.processors.name_extractor import extract_person_name
+from src.processors.name_extractor import (
+    NameIndex, extract_person_name, find_name_fuzzy, fuzzy_search, name_variants, normalize_fuzzy
+)
 
 def test_extract_person_name_json(monkeypatch):
     def fake_run(*args, **kwargs):
@@ -103,3 +105,95 @@ def test_extract_person_name_with_special_characters(monkeypatch):
     res = extract_person_name("текст", "О'Коннор Джон", "fake-model", ".")
     assert isinstance(res, dict)
     assert res.get("full_name") == "О'Коннор Джон"
+
+def test_name_variants():
+    variants = name_variants("Иванов  Иван Иванович")
+    assert "иванов иван иванович" in variants
+    assert "иван иванович иванов" in variants
+    assert "иванов и.и." in variants and "и.и.иванов" in variants
+    assert "иванов" not in variants
+    assert name_variants("Ким") == ["ким"]
+
+def test_name_index_finds_all_applicants_in_one_scan():
+    index = NameIndex(["Иванов Иван Иванович", "Иванова Анна Сергеевна", "Петров Петр Петрович"])
+    text = "Выдан Иванов И. И.; руководитель — П.П. Петров. Подпись: Иванова"
+    found = index.find(text)
+    assert list(found) == ["Иванов Иван Иванович", "Петров Петр Петрович"]
+    assert found["Иванов Иван Иванович"][0].variant == "иванов и.и."
+    assert index.find("Ивановой Анне Сергеевне") == {}  # only whole words
+    assert len(index) == 3
+
+def test_name_index_add_after_search():
+    index = NameIndex(["Иванов Иван"])
+    assert index.find("Петров Петр") == {}
+    index.add("Петров Петр")
+    assert list(index.find("Петров Петр и Иван Иванов")) == ["Петров Петр", "Иванов Иван"]
+    # rebuilding after add() must not repeat matches reported through failure links
+    index = NameIndex(["Иванов Иван", "Иванов"])
+    assert len(index.search("Иван Иванов")) == 2
+    for name in ("Петров Петр", "Сидоров Сидор"):
+        index.add(name)
+        assert len(index.search("Иван Иванов")) == 2
+
+def _levenshtein(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+def test_fuzzy_search_reports_position_and_distance():
+    text = "диплом выдан ивонову ивану и петрову"
+    matches = fuzzy_search("иванову", text, 1)
+    assert len(matches) == 1
+    start, end, distance = matches[0]
+    assert text[start:end] == "ивонову" and distance == 1
+    assert fuzzy_search("иванову", text, 0) == []
+    for start, end, distance in fuzzy_search("петров", text, 2):
+        assert _levenshtein("петров", text[start:end]) == distance <= 2
+
+def test_normalize_fuzzy_folds_homoglyphs_and_endings():
+    normalized, starts, ends = normalize_fuzzy("Ивaнoвy  Ёлкиной")
+    assert normalized == "иванов елкин"
+    assert (starts[0], ends[5]) == (0, 7)
+    assert (starts[7], ends[-1]) == (9, 16)
+
+def test_find_name_fuzzy():
+    name = "Иванов Иван Иванович"
+    text = "Настоящий диплом выдан Ивaнoвy Ивану Ивановичу в том, что"
+    match = find_name_fuzzy(text, name)
+    assert text[match.start:match.end] == "Ивaнoвy Ивану Ивановичу" and match.distance == 0
+    match = find_name_fuzzy("свидетельствует о том, что Ивонов Иван Ивонович", name)
+    assert match.distance == 2
+    assert find_name_fuzzy("свидетельствует о том, что Петров Петр Петрович", name) is None
+
+def test_extract_person_name_falls_back_to_fuzzy_match():
+    res = extract_person_name("диплом выдан Иванову Ивану Ивановичу", "Иванов Иван Иванович")
+    assert res["match_with_expected"] is True
+    assert res["full_name"] == "Иванов Иван Иванович"
+    assert "Иванову Ивану Ивановичу" in res["comment"]
+    res = extract_person_name("диплом выдан Петрову Петру", "Иванов Иван Иванович")
+    assert res["match_with_expected"] is False
+
+def test_fuzzy_name_rejects_other_people():
+    name = "Иванов Иван Иванович"
+    # initials variant "и.и.иванов" must not match a bare surname
+    assert extract_person_name("Авторы: Петров и Иванов", name)["match_with_expected"] is False
+    # a different surname is more than one edit per word away
+    assert extract_person_name("Научный руководитель: Сидоров Иван Иванович", name)["match_with_expected"] is False
+    # "Иван Иванов" inside "Иван Иванович" is not a whole-word match
+    assert find_name_fuzzy("Петров Иван Иванович", name) is None
+    # surname with first name, followed by someone else's patronymic
+    assert extract_person_name("Диплом выдан: Иванов Иван Петрович", name)["match_with_expected"] is False
+    assert find_name_fuzzy("Иванову Ивану Петровне", name) is None
+    # initials keep their dot, so the conjunction "и" is not an initial
+    assert extract_person_name("Петров И. и Иванов", name)["match_with_expected"] is False
+    assert find_name_fuzzy("Выдан Иванову И. И.", name) is not None
+    assert find_name_fuzzy("Иванов Иван, студент 2 курса", name) is not None
+
+def test_fuzzy_search_whole_words():
+    assert fuzzy_search("иван иванов", "петров иван иванович", 0, whole_words=True) == []
+    assert fuzzy_search("иван иванов", "петров иван иванович", 0) == [(7, 18, 0)]
+    assert fuzzy_search("иванов", "а иванов б", 0, whole_words=True) == [(2, 8, 0)]
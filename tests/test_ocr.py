@@ -78,3 +78,374 @@ def test_preprocess_image_with_text_simulation():
     
     processed = preprocess_image(img, "eng")
     assert processed.mode == "1" or processed.mode == "L"
+
+class _FakePage:
+    def __init__(self, text, has_image):
+        self.text = text
+        self.has_image = has_image
+    def get_text(self):
+        return self.text
+    def get_images(self):
+        return [(1,)] if self.has_image else []
+
+class _FakeDoc(list):
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+def _fake_ocr_setup(monkeypatch, pages, layer=None):
+    import src.processors.ocr as ocr
+    def fake_open(path):
+        if layer is None:
+            raise RuntimeError("no text layer")
+        return _FakeDoc(layer)
+    monkeypatch.setattr(ocr.fitz, "open", fake_open)
+    monkeypatch.setattr(ocr, "pdfinfo_from_path", lambda *a, **k: {"Pages": len(pages)})
+    monkeypatch.setattr(ocr, "convert_from_path", lambda *a, first_page, last_page, **k: pages[first_page - 1:last_page])
+    monkeypatch.setattr(ocr.pytesseract, "image_to_osd", lambda *a, **k: "Rotate: 0")
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", lambda img, **k: f"page {img.size[0]}")
+    return ocr
+
+def test_extract_text_parallel_matches_sequential(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    pages = [Image.new("RGB", (100 + i, 50), color="white") for i in range(5)]
+    ocr = _fake_ocr_setup(monkeypatch, pages)
+    monkeypatch.setattr(ocr, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(ocr, "_pool", None)
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF")
+    sequential = ocr.extract_text(str(pdf), "eng", workers=1)
+    parallel = ocr.extract_text(str(pdf), "eng", workers=3)
+    assert parallel == sequential
+    assert sequential == "".join(f"page {100 + i}\n" for i in range(5))
+    ocr.shutdown_pool()
+
+def test_worker_pool_reused_across_documents(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    pages = [Image.new("RGB", (100 + i, 50), color="white") for i in range(3)]
+    ocr = _fake_ocr_setup(monkeypatch, pages)
+    created = []
+    def pool(max_workers):
+        created.append(max_workers)
+        return ThreadPoolExecutor(max_workers=max_workers)
+    monkeypatch.setattr(ocr, "ProcessPoolExecutor", pool)
+    monkeypatch.setattr(ocr, "_pool", None)
+    for name in ("a.pdf", "b.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF")
+        ocr.extract_text(str(tmp_path / name), "eng", workers=2)
+    assert created == [2]
+    ocr.extract_text(str(tmp_path / "a.pdf"), "eng", workers=3)
+    assert created == [2, 3]
+    ocr.shutdown_pool()
+
+def test_worker_pool_sized_by_configuration_not_page_count(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import src.processors.ocr as ocr
+    created = []
+    def pool(max_workers):
+        created.append(max_workers)
+        return ThreadPoolExecutor(max_workers=max_workers)
+    monkeypatch.setattr(ocr, "_pool", None)
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF")
+    texts = []
+    for count in (2, 4, 3):
+        _fake_ocr_setup(monkeypatch, [Image.new("RGB", (100 + i, 50), color="white") for i in range(count)])
+        monkeypatch.setattr(ocr, "ProcessPoolExecutor", pool)
+        texts.append(ocr.extract_text(str(pdf), "eng", workers=4))
+    assert created == [4]
+    assert texts[1] == "page 100\npage 101\npage 102\npage 103\n"
+    ocr.shutdown_pool()
+
+def test_ocr_options_workers():
+    from src.processors.ocr import ocr_options, resolve_workers
+    assert ocr_options({"lang": "eng"})["workers"] == 1
+    assert ocr_options({"lang": "eng", "workers": 4})["workers"] == 4
+    assert resolve_workers(0) >= 1
+
+def test_iter_page_images_rasterizes_one_page_at_a_time(monkeypatch):
+    import src.processors.ocr as ocr
+    calls = []
+    def fake_convert(path, dpi, first_page, last_page):
+        calls.append((first_page, last_page, dpi))
+        return [Image.new("RGB", (10, 10))]
+    monkeypatch.setattr(ocr, "convert_from_path", fake_convert)
+    images = ocr.iter_page_images("doc.pdf", [1, 2, 4], dpi=150)
+    assert calls == []
+    assert next(images)[0] == 1
+    assert calls == [(1, 1, 150)]
+    assert [number for number, _ in images] == [2, 4]
+    assert calls == [(1, 1, 150), (2, 2, 150), (4, 4, 150)]
+
+def test_extract_text_reads_back_cache(tmp_path, monkeypatch):
+    from src.core.text_cache import TextCache
+    ocr = _fake_ocr_setup(monkeypatch, [Image.new("RGB", (100, 50), color="white")])
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF")
+    cache = TextCache(str(tmp_path / "cache"))
+    assert ocr.extract_text(str(pdf), "eng", cache=cache) == "page 100\n"
+    monkeypatch.setattr(ocr, "iter_text", lambda *a, **k: iter(["should not run"]))
+    assert ocr.extract_text(str(pdf), "eng", cache=cache) == "page 100\n"
+    assert ocr.extract_text(str(pdf), "rus", cache=cache) == "should not run"
+    assert not (tmp_path / "doc.pdf.ocr.txt").exists()
+
+def test_extract_text_ocr_only_for_image_pages(tmp_path, monkeypatch):
+    pages = [Image.new("RGB", (100 + i, 50), color="white") for i in range(3)]
+    layer = [
+        _FakePage("Текстовый слой первой страницы документа", has_image=False),
+        _FakePage("", has_image=True),
+        _FakePage("", has_image=False),
+    ]
+    ocr = _fake_ocr_setup(monkeypatch, pages, layer=layer)
+    pdf = tmp_path / "mixed.pdf"
+    pdf.write_bytes(b"%PDF")
+    txt = ocr.extract_text(str(pdf), "eng", rasterizer="pdf2image")
+    assert txt == "Текстовый слой первой страницы документа\npage 101\n\n"
+
+def test_extract_text_text_layer_only(tmp_path, monkeypatch):
+    layer = [_FakePage("Страница с достаточным текстовым слоем", has_image=True)]
+    ocr = _fake_ocr_setup(monkeypatch, [], layer=layer)
+    monkeypatch.setattr(ocr, "ocr_page", lambda *a, **k: "should not run")
+    pdf = tmp_path / "text.pdf"
+    pdf.write_bytes(b"%PDF")
+    assert ocr.extract_text(str(pdf), "eng") == "Страница с достаточным текстовым слоем\n"
+
+def test_extract_text_renders_pages_with_pymupdf(tmp_path, monkeypatch):
+    import fitz
+    import io
+    import src.processors.ocr as ocr
+    scan = io.BytesIO()
+    Image.new("RGB", (60, 30), color="white").save(scan, format="PNG")
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Page with a proper text layer")
+    doc.new_page().insert_image(fitz.Rect(0, 0, 200, 100), stream=scan.getvalue())
+    pdf = tmp_path / "mixed.pdf"
+    doc.save(str(pdf))
+    def fail_convert(*a, **k):
+        raise AssertionError("poppler must not be used")
+    monkeypatch.setattr(ocr, "convert_from_path", fail_convert)
+    monkeypatch.setattr(ocr.pytesseract, "image_to_osd", lambda *a, **k: "Rotate: 0")
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", lambda img, **k: f"ocr {img.size[0]}x{img.size[1]}")
+    txt = ocr.extract_text(str(pdf), "eng", dpi=72)
+    assert txt == "Page with a proper text layer\n\nocr 595x842\n"
+
+def test_pixmap_images_own_their_pixels(monkeypatch):
+    import fitz
+    import gc
+    import weakref
+    import src.processors.ocr as ocr
+    doc = fitz.open()
+    doc.new_page(width=40, height=20).draw_rect(fitz.Rect(0, 0, 40, 20), color=(1, 0, 0), fill=(1, 0, 0))
+    pixmaps = []
+    render = fitz.Page.get_pixmap
+    def tracked(page, **k):
+        pix = render(page, **k)
+        pixmaps.append(weakref.ref(pix))
+        return pix
+    monkeypatch.setattr(fitz.Page, "get_pixmap", tracked)
+    number, img = next(ocr.iter_pixmap_images(doc, [1], dpi=72))
+    gc.collect()
+    assert number == 1 and img.mode == "RGB" and img.size == (40, 20)
+    assert pixmaps[0]() is None
+    assert img.getpixel((20, 10)) == (255, 0, 0)
+
+def _text_lines_image(width=600, height=400):
+    from PIL import ImageDraw
+    img = Image.new("L", (width, height), color=255)
+    draw = ImageDraw.Draw(img)
+    for top in range(20, height - 20, 30):
+        for left in range(20, width - 60, 50):
+            # x-height band with a capital/ascender stem on top, like a word of real text
+            draw.rectangle([left, top + 6, left + 35, top + 18], fill=0)
+            draw.rectangle([left, top, left + 4, top + 6], fill=0)
+    return img
+
+def test_estimate_orientation_upright_and_blank():
+    from src.processors.ocr import estimate_orientation, binarize
+    assert estimate_orientation(binarize(_text_lines_image())) == 0
+    assert estimate_orientation(binarize(Image.new("RGB", (100, 100), color="white"))) == 0
+
+def test_estimate_orientation_upside_down():
+    from src.processors.ocr import estimate_orientation, binarize
+    page = binarize(_text_lines_image())
+    assert estimate_orientation(page.rotate(180)) == 180
+
+def test_estimate_orientation_unsure_without_ascenders():
+    from PIL import ImageDraw
+    from src.processors.ocr import estimate_orientation, binarize
+    img = Image.new("L", (600, 400), color=255)
+    draw = ImageDraw.Draw(img)
+    for top in range(20, 380, 30):
+        for left in range(20, 540, 50):
+            draw.rectangle([left, top, left + 35, top + 12], fill=0)
+    # symmetric lines give no up/down evidence: leave it to OSD
+    assert estimate_orientation(binarize(img)) is None
+
+def test_detect_orientation_falls_back_to_osd_when_vertical(monkeypatch):
+    import src.processors.ocr as ocr
+    calls = []
+    def fake_osd(img, lang):
+        calls.append(lang)
+        return "Page number: 0\nRotate: 90\n"
+    monkeypatch.setattr(ocr.pytesseract, "image_to_osd", fake_osd)
+    upright = ocr.binarize(_text_lines_image())
+    assert ocr.detect_orientation(upright, "eng") == 0
+    assert calls == []
+    rotated = upright.rotate(90, expand=True)
+    assert ocr.estimate_orientation(rotated) is None
+    assert ocr.detect_orientation(rotated, "eng") == 90
+    assert calls == ["eng"]
+
+def test_document_orientation_detected_once(monkeypatch):
+    import src.processors.ocr as ocr
+    detected = []
+    def fake_detect(img, lang, backend="pytesseract"):
+        detected.append(img.size)
+        return 90
+    applied = []
+    monkeypatch.setattr(ocr, "detect_orientation", fake_detect)
+    monkeypatch.setattr(ocr, "ocr_page", lambda img, lang, angle=None, preprocessing="legacy", backend="pytesseract": applied.append(angle) or "text")
+    images = iter([(1, _text_lines_image()), (2, _text_lines_image()), (3, _text_lines_image())])
+    result = list(ocr._ocr_pages(images, "eng", 1, orientation="document"))
+    assert [number for number, _ in result] == [1, 2, 3]
+    assert len(detected) == 1
+    assert applied == [90, 90, 90]
+
+def test_otsu_threshold_separates_two_levels():
+    import numpy as np
+    from src.processors.ocr import otsu_threshold
+    gray = np.array([[30] * 50 + [220] * 50] * 10, dtype=np.uint8)
+    t = otsu_threshold(gray)
+    assert 30 <= t < 220
+
+def test_remove_specks_drops_isolated_pixels():
+    import numpy as np
+    from src.processors.ocr import remove_specks
+    ink = np.zeros((10, 10), dtype=bool)
+    ink[1, 1] = True
+    ink[5:8, 5:8] = True
+    cleaned = remove_specks(ink)
+    assert not cleaned[1, 1]
+    assert cleaned[5:8, 5:8].all()
+
+def test_estimate_skew_recovers_rotation():
+    import numpy as np
+    from src.processors.ocr import estimate_skew
+    skewed = _text_lines_image(1200, 800).rotate(3, expand=True, fillcolor=255)
+    assert abs(estimate_skew(np.asarray(skewed) < 128) - 3) <= 0.5
+    assert estimate_skew(np.asarray(_text_lines_image(1200, 800)) < 128) == 0
+
+def test_preprocess_image_numpy_returns_binary_image():
+    from src.processors.ocr import preprocess_image_numpy
+    for img in (Image.new("RGB", (100, 100), color="white"), _text_lines_image().convert("RGB")):
+        processed = preprocess_image_numpy(img, "eng")
+        assert processed.mode == "1"
+
+def test_get_backend_is_cached_and_falls_back(monkeypatch):
+    import src.processors.ocr as ocr
+    monkeypatch.setattr(ocr, "_backends", {})
+    assert ocr.get_backend("pytesseract") is ocr.get_backend("pytesseract")
+    class Missing(ocr.OcrBackend):
+        def __init__(self):
+            raise ImportError("No module named 'tesserocr'")
+    monkeypatch.setitem(ocr.OCR_BACKENDS, "tesserocr", Missing)
+    assert isinstance(ocr.get_backend("tesserocr"), ocr.PytesseractBackend)
+
+def test_ocr_page_uses_backend(monkeypatch):
+    import src.processors.ocr as ocr
+    class Engine(ocr.OcrBackend):
+        name = "fake"
+        def __init__(self):
+            self.calls = []
+        def image_to_string(self, img, lang):
+            self.calls.append(("text", lang))
+            return "recognized"
+        def image_to_osd(self, img, lang):
+            self.calls.append(("osd", lang))
+            return "Rotate: 0"
+    engine = Engine()
+    monkeypatch.setattr(ocr, "_backends", {"fake": engine})
+    assert ocr.ocr_page(_text_lines_image(), "rus", backend="fake") == "recognized"
+    assert engine.calls == [("text", "rus")]
+
+def test_open_text_extracts_only_requested_pages(tmp_path, monkeypatch):
+    pages = [Image.new("RGB", (100 + i, 50), color="white") for i in range(4)]
+    ocr = _fake_ocr_setup(monkeypatch, pages)
+    recognized = []
+    original = ocr.ocr_page
+    def counting_ocr_page(img, *args):
+        recognized.append(img.size[0])
+        return original(img, *args)
+    monkeypatch.setattr(ocr, "ocr_page", counting_ocr_page)
+    pdf = tmp_path / "long.pdf"
+    pdf.write_bytes(b"%PDF")
+    lazy = ocr.open_text(str(pdf), "eng", rasterizer="pdf2image")
+    assert recognized == []
+    assert lazy.prefix(10) == "page 100\npage 101\n"
+    assert recognized == [100, 101]
+    assert not lazy.exhausted
+    assert lazy.full() == ocr.extract_text(str(pdf), "eng")
+    assert lazy.exhausted
+    assert lazy.prefix(10) == "page 100\npage 101\n"
+
+def test_open_text_caches_only_complete_documents(tmp_path, monkeypatch):
+    from src.core.text_cache import TextCache
+    pages = [Image.new("RGB", (100 + i, 50), color="white") for i in range(3)]
+    ocr = _fake_ocr_setup(monkeypatch, pages)
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF")
+    cache = TextCache(str(tmp_path / "cache"))
+    partial = ocr.open_text(str(pdf), "eng", cache=cache)
+    partial.prefix(5)
+    partial.close()
+    # only the leading pages are stored, as a prefix entry
+    assert [p.name.endswith(".prefix.txt") for p in (tmp_path / "cache").glob("*.txt")] == [True]
+    monkeypatch.setattr(ocr, "ocr_page", lambda *a, **k: pytest.fail("cached prefix must not be OCR'd"))
+    repeated = ocr.open_text(str(pdf), "eng", cache=cache)
+    assert repeated.prefix(5) == "page 100\n"
+    repeated.close()
+    monkeypatch.setattr(ocr, "ocr_page", lambda img, *a, **k: f"page {img.size[0]}")
+    full = ocr.open_text(str(pdf), "eng", cache=cache).full()
+    assert full == "page 100\npage 101\npage 102\n"
+    assert len(list((tmp_path / "cache").glob("*.txt"))) == 2
+    assert ocr.open_text(str(pdf), "eng", cache=cache).prefix(1) == full
+
+def test_merge_pages_keeps_order_with_missing_ocr_pages():
+    from src.processors.ocr import _merge_pages
+    merged = _merge_pages(["text\n", None, None, "more"], iter([(3, "ocr three")]))
+    assert "".join(merged) == "text\n\n\nocr three\nmore\n"
+
+def test_script_language():
+    from src.processors.ocr import script_language
+    assert script_language("Диплом бакалавра по направлению подготовки", "rus+eng") == "rus"
+    assert script_language("IELTS Test Report Form ACADEMIC", "rus+eng") == "eng"
+    assert script_language("Диплом бакалавра Bachelor of Science degree", "rus+eng") == "rus+eng"
+    assert script_language("short", "rus+eng") == "rus+eng"
+    assert script_language("IELTS Test Report Form ACADEMIC", "rus") == "rus"
+
+def test_page_language_probes_downscaled_page(monkeypatch):
+    import src.processors.ocr as ocr
+    probes = []
+    def fake_to_string(img, lang, **k):
+        probes.append((max(img.size), lang))
+        return "Test Report Form Candidate Number"
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", fake_to_string)
+    page = Image.new("RGB", (2480, 3508), color="white")
+    assert ocr.page_language(page, "rus+eng") == "eng"
+    assert probes == [(ocr.LANG_PROBE_SIZE, "rus+eng")]
+    assert ocr.page_language(page, "eng") == "eng"
+
+def test_ocr_pages_uses_detected_language(monkeypatch, caplog):
+    import logging
+    import src.processors.ocr as ocr
+    used = []
+    monkeypatch.setattr(ocr, "ocr_page", lambda img, lang, *a: used.append(lang) or "text")
+    probes = {"black": "Выписка из зачётной ведомости студента", "white": "short"}
+    images = iter([(1, Image.new("RGB", (10, 10), "black")), (2, Image.new("RGB", (10, 10), "white"))])
+    monkeypatch.setattr(ocr, "page_language", lambda img, lang, backend:
+                        ocr.script_language(probes["black" if img.getpixel((0, 0)) == (0, 0, 0) else "white"], lang))
+    with caplog.at_level(logging.INFO):
+        list(ocr._ocr_pages(images, "rus+eng", 1, lang_detect=True))
+    assert used == ["rus", "rus+eng"]
+    assert "Page 1: OCR language rus" in caplog.text
@@ -0,0 +1,26 @@
+from src.processors.pipeline import Pipeline, Stage, name_mismatch
+
+def test_stages_run_cheapest_first_and_short_circuit():
+    calls = []
+    def check(docs):
+        calls.append(("check", [d["id"] for d in docs]))
+        for d in docs:
+            d["fio_match"] = d["id"] % 2 == 0
+    def classify(docs):
+        calls.append(("classify", [d["id"] for d in docs]))
+    pipeline = Pipeline([Stage("classify", 5.0, classify, skip=name_mismatch), Stage("check", 0.001, check)])
+    docs = pipeline.run([{"id": i} for i in range(4)])
+    assert calls == [("check", [0, 1, 2, 3]), ("classify", [0, 2])]
+    assert [d.get("skipped", []) for d in docs] == [[], ["classify"], [], ["classify"]]
+    assert pipeline.processed == {"check": 4, "classify": 2}
+    assert pipeline.skipped == {"check": 0, "classify": 2}
+    assert "classify 2 run, 2 skipped" in pipeline.stats()
+
+def test_stage_without_rule_or_documents():
+    calls = []
+    pipeline = Pipeline([Stage("classify", 5.0, calls.append, skip=name_mismatch)])
+    pipeline.run([{"fio_match": False}])
+    assert calls == []
+    pipeline = Pipeline([Stage("classify", 5.0, calls.append)])
+    pipeline.run([{"fio_match": False}])
+    assert len(calls) == 1
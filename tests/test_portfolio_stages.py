@@ -0,0 +1,39 @@
+from src.processors.pipeline import SKIPPED_DESCRIPTION
+from src.processors.portfolio_stages import PortfolioStages
+
+CATEGORIES = ["1.1 диплом с отличием", "Иное"]
+
+def _fake_batch(monkeypatch, prompts):
+    def fake_batch(texts, *a, **k):
+        prompts.extend(texts)
+        return [("1.1 диплом с отличием", "Диплом", "") for _ in texts]
+    monkeypatch.setattr("src.processors.portfolio_stages.classify_batch_with_llm", fake_batch)
+
+def test_keywords_see_compressed_text(monkeypatch):
+    seen, prompts = [], []
+    class FakeCascade:
+        def decide(self, text):
+            seen.append(text)
+        def record(self, decision, detected):
+            pass
+    monkeypatch.setattr("src.processors.portfolio_stages.compress_prompt", lambda text, budget: text.upper())
+    _fake_batch(monkeypatch, prompts)
+    stages = PortfolioStages(CATEGORIES, "m", "out", {}, cascade=FakeCascade())
+    docs = [{"filename": "a.pdf", "claimed": "Диплом бакалавра", "head": "диплом с отличием"}]
+    stages.classify_documents(docs)
+    assert seen == prompts == ["ДИПЛОМ С ОТЛИЧИЕМ"]
+    assert docs[0]["detected"] == "1.1 диплом с отличием"
+
+def test_run_checks_names_first_and_skips_other_people(monkeypatch, tmp_path):
+    prompts = []
+    _fake_batch(monkeypatch, prompts)
+    stages = PortfolioStages(CATEGORIES, "m", str(tmp_path), {"skip_llm_on_name_mismatch": True, "batch_size": 4})
+    docs = [
+        {"filename": "own.pdf", "claimed": "диплом", "head": "диплом", "text": "Диплом выдан Иванову Ивану Ивановичу"},
+        {"filename": "other.pdf", "claimed": "диплом", "head": "грамота", "text": "Грамота Петрову Петру Петровичу"},
+    ]
+    pipeline = stages.run(docs, "Иванов Иван Иванович")
+    assert prompts == ["диплом"]
+    assert [d["fio_match"] for d in docs] == [True, False]
+    assert docs[1]["description"] == SKIPPED_DESCRIPTION and docs[1]["match"] is False
+    assert pipeline.skipped == {"name check": 0, "classification": 1}
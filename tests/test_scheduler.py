@@ -0,0 +1,40 @@
+import threading
+import time
+from src.processors.scheduler import run_bounded
+
+def test_results_keep_job_order():
+    def job(i):
+        def run():
+            time.sleep(0.01 * (5 - i))  # later jobs finish first
+            return i
+        return run
+    results = run_bounded([job(i) for i in range(5)], concurrency=5)
+    assert [r.value for r in results] == [0, 1, 2, 3, 4]
+
+def test_concurrency_limit_and_timings():
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+    def job():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+        return "ok"
+    results = run_bounded([job] * 6, concurrency=2)
+    assert state["peak"] == 2
+    assert all(r.service_time >= 0.04 for r in results)
+    # the last two jobs waited for two rounds of the first four
+    assert max(r.queue_wait for r in results) >= 0.08
+
+def test_empty_and_exceptions():
+    assert run_bounded([], concurrency=3) == []
+    def boom():
+        raise ValueError("fail")
+    try:
+        run_bounded([boom], concurrency=1)
+    except ValueError as e:
+        assert str(e) == "fail"
+    else:
+        raise AssertionError("exception was not propagated")
@@ -0,0 +1,30 @@
+import os
+from src.core.text_cache import TextCache
+
+def test_key_depends_on_content_and_settings(tmp_path):
+    cache = TextCache(str(tmp_path / "cache"))
+    a = tmp_path / "a.pdf"
+    b = tmp_path / "b.pdf"
+    a.write_bytes(b"same")
+    b.write_bytes(b"same")
+    assert cache.key(str(a), "rus", 300) == cache.key(str(b), "rus", 300)
+    assert cache.key(str(a), "rus", 300) != cache.key(str(a), "eng", 300)
+    b.write_bytes(b"changed")
+    assert cache.key(str(a), "rus", 300) != cache.key(str(b), "rus", 300)
+
+def test_get_put_roundtrip(tmp_path):
+    cache = TextCache(str(tmp_path / "cache"))
+    assert cache.get("missing") is None
+    cache.put("k", "Текст документа\n")
+    assert cache.get("k") == "Текст документа\n"
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TextCache(str(tmp_path / "cache"), max_bytes=25)
+    cache.put("old", "x" * 10)
+    cache.put("new", "y" * 10)
+    os.utime(cache._path("old"), (1, 1))
+    os.utime(cache._path("new"), (2, 2))
+    cache.put("newest", "z" * 10)
+    assert cache.get("old") is None
+    assert cache.get("new") == "y" * 10
+    assert cache.get("newest") == "z" * 10
@@ -0,0 +1,36 @@
+from src.processors.text_compressor import compress_text, estimate_tokens, line_quality, clean_line
+
+OCR_TEXT = """YEE eee PSs Sg ФР EY Оф оф Py hae gg Py Ee Ge Pes Go gd be
+roe ee ee ee se ee ee ee ee ee ee ee ee ee
+| ФЕДЕРАЛЬНОЕ ГОСУДАРСТВЕННОЕ | БЮДЖЕТНОЕ УЧРЕЖДЕНИЕ ||
+Настоящий   диплом   свидетельствует о том, что
+Иванов Иван Иванович
+История России 4 144 отлично
+Экономика 3 108 хорошо
+| ФЕДЕРАЛЬНОЕ ГОСУДАРСТВЕННОЕ | БЮДЖЕТНОЕ УЧРЕЖДЕНИЕ ||
+Философия 4 144 хорошо
+"""
+
+def test_drops_garbage_and_duplicates():
+    out = compress_text(OCR_TEXT, token_budget=500)
+    lines = out.splitlines()
+    assert lines[0] == "ФЕДЕРАЛЬНОЕ ГОСУДАРСТВЕННОЕ БЮДЖЕТНОЕ УЧРЕЖДЕНИЕ"
+    assert "YEE" not in out and "roe" not in out
+    assert out.count("ФЕДЕРАЛЬНОЕ") == 1
+    assert "Настоящий диплом свидетельствует том, что" in lines
+
+def test_budget_keeps_informative_lines_in_order():
+    out = compress_text(OCR_TEXT, token_budget=20)
+    assert estimate_tokens(out) <= 20
+    lines = out.splitlines()
+    assert "Настоящий диплом свидетельствует том, что" in lines
+    assert "Иванов Иван Иванович" in lines
+    assert "Философия 4 144 хорошо" not in lines
+    assert lines.index("Настоящий диплом свидетельствует том, что") < lines.index("Иванов Иван Иванович")
+
+def test_max_chars_and_helpers():
+    assert len(compress_text(OCR_TEXT, token_budget=500, max_chars=60)) <= 60
+    assert clean_line("a | b || ® c") == "a b c"
+    assert line_quality("ee eee PSs") == 0.0
+    assert line_quality("Настоящий диплом") == 1.0
+    assert compress_text("") == ""